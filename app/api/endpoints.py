@@ -1,21 +1,70 @@
+import asyncio
+from typing import AsyncIterator, Optional
+import orjson
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from datetime import datetime
+from sqlalchemy import select, delete, func, bindparam, lambda_stmt, inspect
+from datetime import datetime, timezone
 
-from app.db.session import get_db
-from app.models.database import Scenario, Simulation, SimulationStatus, DecisionType as DBDecisionType
+from app.db.session import get_db, get_sessionmaker
+from app.models.database import Scenario, Simulation, SimulationStatus
 from app.schemas.schemas import (
     ScenarioCreate, ScenarioResponse,
     SimulationCreate, SimulationResponse, SimulationInput, SimulationResult,
-    APIResponse, DecisionType, QuickSimParams
+    APIResponse, DecisionType, QuickSimParams,
+    SCENARIO_LIST_ADAPTER, SIMULATION_LIST_ADAPTER
 )
 from app.services.llm_service import LLMService, DataService
-from app.services.simulation_engine import SimulationEngine
+from app.services.llm_cache import PROMPT_VERSION, cached_call, make_cache_key
+from app.services.simulation_engine import get_process_pool, run_simulation_in_process
 from app.core.exceptions import DataNotFoundError, SimulationError
 
 router = APIRouter()
 
+# Statements built once; SQLAlchemy caches their compiled SQL by lambda identity
+_list_scenarios_stmt = lambda_stmt(
+    lambda: select(Scenario)
+    .where(Scenario.user_id == bindparam("user_id"))
+    .order_by(Scenario.created_at.desc())
+)
+_delete_scenario_stmt = lambda_stmt(
+    lambda: delete(Scenario).where(Scenario.id == bindparam("scenario_id"))
+)
+_list_simulations_stmt = lambda_stmt(
+    lambda: select(Simulation)
+    .where(Simulation.scenario_id == bindparam("scenario_id"))
+    .order_by(Simulation.created_at.desc())
+)
+_count_scenarios_stmt = lambda_stmt(
+    lambda: select(func.count())
+    .select_from(Scenario)
+    .where(Scenario.user_id == bindparam("user_id"))
+)
+
+# Columns a client may request with ?fields= on list endpoints
+SCENARIO_FIELDS = frozenset(ScenarioResponse.model_fields)
+
+# Rows fetched per round-trip by the streaming endpoints
+STREAM_BATCH_SIZE = 200
+
+
+async def _stream_ndjson(stmt, adapter: TypeAdapter) -> AsyncIterator[bytes]:
+    """
+    Yield query results as NDJSON, one chunk per fetched partition.
+    Uses its own session: the body is produced after the endpoint returns.
+    """
+    session_factory = get_sessionmaker()
+    async with session_factory() as session:
+        result = await session.stream(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for partition in result.scalars().partitions():
+            rows = adapter.dump_python(
+                adapter.validate_python(partition, from_attributes=True),
+                mode="json"
+            )
+            yield b"".join(orjson.dumps(row) + b"\n" for row in rows)
+
 
 # ==================== SCENARIOS ====================
 
@@ -29,7 +78,7 @@ async def create_scenario(
     db_scenario = Scenario(
         user_id=user_id,
         name=scenario.name,
-        decision_type=DBDecisionType(scenario.decision_type.value),
+        decision_type=scenario.decision_type.value,
         description=scenario.description
     )
     db.add(db_scenario)
@@ -39,25 +88,79 @@ async def create_scenario(
     return APIResponse(
         success=True,
         message="Scenario created successfully",
-        data=ScenarioResponse.model_validate(db_scenario).model_dump()
+        data=ScenarioResponse.model_validate(db_scenario)
     )
 
 
 @router.get("/scenarios", response_model=APIResponse)
 async def list_scenarios(
     db: AsyncSession = Depends(get_db),
-    user_id: int = 1  # TODO: Get from auth
+    user_id: int = 1,  # TODO: Get from auth
+    fields: Optional[str] = None
 ):
-    """List all scenarios for current user"""
-    result = await db.execute(
-        select(Scenario).where(Scenario.user_id == user_id).order_by(Scenario.created_at.desc())
-    )
+    """
+    List all scenarios for current user.
+    fields: optional comma-separated column list (e.g. "id,name") to fetch only those columns.
+    """
+    if fields:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = set(names) - SCENARIO_FIELDS
+        if not names or unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}" if unknown else "No fields given"
+            )
+        result = await db.execute(
+            select(*[getattr(Scenario, name) for name in names])
+            .where(Scenario.user_id == user_id)
+            .order_by(Scenario.created_at.desc())
+        )
+        rows = [dict(row._mapping) for row in result]
+        return APIResponse(
+            success=True,
+            message=f"Found {len(rows)} scenarios",
+            data=rows
+        )
+
+    result = await db.execute(_list_scenarios_stmt, {"user_id": user_id})
     scenarios = result.scalars().all()
     
     return APIResponse(
         success=True,
         message=f"Found {len(scenarios)} scenarios",
-        data=[ScenarioResponse.model_validate(s).model_dump() for s in scenarios]
+        data=SCENARIO_LIST_ADAPTER.validate_python(scenarios, from_attributes=True)
+    )
+
+
+@router.get("/scenarios/count", response_model=APIResponse)
+async def count_scenarios(
+    db: AsyncSession = Depends(get_db),
+    user_id: int = 1  # TODO: Get from auth
+):
+    """Count scenarios for current user without loading them"""
+    result = await db.execute(_count_scenarios_stmt, {"user_id": user_id})
+    count = result.scalar_one()
+    
+    return APIResponse(
+        success=True,
+        message=f"Found {count} scenarios",
+        data={"count": count}
+    )
+
+
+@router.get("/scenarios/stream")
+async def stream_scenarios(
+    user_id: int = 1  # TODO: Get from auth
+):
+    """Stream all scenarios for current user as NDJSON"""
+    stmt = (
+        select(Scenario)
+        .where(Scenario.user_id == user_id)
+        .order_by(Scenario.created_at.desc())
+    )
+    return StreamingResponse(
+        _stream_ndjson(stmt, SCENARIO_LIST_ADAPTER),
+        media_type="application/x-ndjson"
     )
 
 
@@ -67,10 +170,7 @@ async def get_scenario(
     db: AsyncSession = Depends(get_db)
 ):
     """Get a specific scenario by ID"""
-    result = await db.execute(
-        select(Scenario).where(Scenario.id == scenario_id)
-    )
-    scenario = result.scalar_one_or_none()
+    scenario = await db.get(Scenario, scenario_id)
     
     if not scenario:
         raise DataNotFoundError(f"Scenario {scenario_id} not found")
@@ -78,7 +178,7 @@ async def get_scenario(
     return APIResponse(
         success=True,
         message="Scenario found",
-        data=ScenarioResponse.model_validate(scenario).model_dump()
+        data=ScenarioResponse.model_validate(scenario)
     )
 
 
@@ -88,17 +188,12 @@ async def delete_scenario(
     db: AsyncSession = Depends(get_db)
 ):
     """Delete a scenario"""
-    result = await db.execute(
-        select(Scenario).where(Scenario.id == scenario_id)
-    )
-    scenario = result.scalar_one_or_none()
+    result = await db.execute(_delete_scenario_stmt, {"scenario_id": scenario_id})
+    await db.commit()
     
-    if not scenario:
+    if result.rowcount == 0:
         raise DataNotFoundError(f"Scenario {scenario_id} not found")
     
-    await db.delete(scenario)
-    await db.commit()
-    
     return APIResponse(
         success=True,
         message="Scenario deleted successfully",
@@ -108,42 +203,52 @@ async def delete_scenario(
 
 # ==================== SIMULATIONS ====================
 
-@router.post("/simulations", response_model=APIResponse)
-async def create_simulation(
-    simulation: SimulationCreate,
-    db: AsyncSession = Depends(get_db)
+async def _mark_failed(
+    db: AsyncSession,
+    scenario: Scenario,
+    db_simulation: Simulation,
+    error: Exception
 ):
-    """Create and run a new simulation"""
-    
-    # Get scenario
-    result = await db.execute(
-        select(Scenario).where(Scenario.id == simulation.scenario_id)
-    )
-    scenario = result.scalar_one_or_none()
-    
-    if not scenario:
-        raise DataNotFoundError(f"Scenario {simulation.scenario_id} not found")
+    """
+    Commit the simulation as FAILED after an error in the pipeline.
+    The session may be unusable (a failed flush), so it is rolled back first;
+    the rollback drops rows first inserted in this transaction (the simulation,
+    and the scenario of a quick simulation), which are added back.
+    """
+    await db.rollback()
+    for obj in (scenario, db_simulation):
+        if inspect(obj).transient:
+            db.add(obj)
+    db_simulation.status = SimulationStatus.FAILED.value
+    db_simulation.error_message = str(error)
+    await db.commit()
+
+
+async def _run_simulation(
+    db: AsyncSession,
+    scenario: Scenario,
+    sim_input: SimulationInput
+) -> SimulationResponse:
+    """Run the full pipeline (LLM -> data -> Monte Carlo -> report) for a scenario"""
     
-    # Create simulation record
+    # Create simulation record; it is committed once, when the run finishes
     db_simulation = Simulation(
         scenario_id=scenario.id,
-        input_data=simulation.input_data.model_dump(),
-        status=SimulationStatus.PENDING
+        input_data=sim_input.model_dump(),
+        status=SimulationStatus.RUNNING.value
     )
     db.add(db_simulation)
-    await db.commit()
-    await db.refresh(db_simulation)
+    await db.flush()
     
     try:
-        # Update status to running
-        db_simulation.status = SimulationStatus.RUNNING
-        await db.commit()
-        
         # Step 1: LLM structuring
         llm_service = LLMService()
-        structured_data = await llm_service.structure_query(
-            simulation.input_data.query,
-            scenario.decision_type.value
+        query = sim_input.query
+        decision_type = scenario.decision_type
+        structured_data = await cached_call(
+            (llm_service.provider, llm_service.model, PROMPT_VERSION, "structure", query, decision_type),
+            lambda: llm_service.structure_query(query, decision_type),
+            db
         )
         
         # Step 2: Fetch external data
@@ -151,30 +256,37 @@ async def create_simulation(
         external_data = {}
         
         # Get data based on decision type
-        if scenario.decision_type == DBDecisionType.RELOCATION:
-            cities = structured_data.get("cities", [])
-            external_data["cost_of_living"] = {}
-            external_data["tax_rates"] = {}
-            for city in cities:
-                external_data["cost_of_living"][city.lower()] = await data_service.get_cost_of_living(city)
-                external_data["tax_rates"][city.lower()] = await data_service.get_tax_rates(city)
+        if decision_type == DecisionType.RELOCATION:
+            cost_of_living, tax_rates = await data_service.get_city_data(
+                structured_data.get("cities", [])
+            )
+            external_data["cost_of_living"] = cost_of_living
+            external_data["tax_rates"] = tax_rates
         
-        # Step 3: Run simulation
-        engine = SimulationEngine(
-            time_horizon_years=simulation.input_data.time_horizon_years,
-            monte_carlo_runs=simulation.input_data.monte_carlo_runs or 1000
+        # Step 3: Run simulation (CPU-bound, off the event loop)
+        # Seeded from its inputs: the same inputs give the same numbers, so the
+        # report can be cached on the inputs rather than on per-call results
+        monte_carlo_runs = sim_input.monte_carlo_runs or 1000
+        simulation_key = (
+            decision_type, structured_data, external_data,
+            sim_input.time_horizon_years, monte_carlo_runs
         )
-        
-        simulation_results = await engine.run_simulation(
-            DecisionType(scenario.decision_type.value),
+        simulation_results = await asyncio.get_running_loop().run_in_executor(
+            get_process_pool(),
+            run_simulation_in_process,
+            DecisionType(decision_type),
             structured_data,
-            external_data
+            external_data,
+            sim_input.time_horizon_years,
+            monte_carlo_runs,
+            int(make_cache_key(simulation_key)[-16:], 16)
         )
         
         # Step 4: Generate AI report
-        report = await llm_service.generate_report(
-            simulation.input_data.query,
-            simulation_results
+        report = await cached_call(
+            (llm_service.provider, llm_service.model, PROMPT_VERSION, "report", query, *simulation_key),
+            lambda: llm_service.generate_report(query, simulation_results),
+            db
         )
         
         # Combine results
@@ -186,37 +298,45 @@ async def create_simulation(
         
         # Update simulation record
         db_simulation.result_json = final_results
-        db_simulation.status = SimulationStatus.COMPLETED
-        db_simulation.completed_at = datetime.utcnow()
+        db_simulation.status = SimulationStatus.COMPLETED.value
+        db_simulation.completed_at = datetime.now(timezone.utc)
         await db.commit()
-        await db.refresh(db_simulation)
         
-        return APIResponse(
-            success=True,
-            message="Simulation completed successfully",
-            data=SimulationResponse.model_validate(db_simulation).model_dump()
-        )
+        return SimulationResponse.model_validate(db_simulation)
         
     except Exception as e:
-        db_simulation.status = SimulationStatus.FAILED
-        db_simulation.error_message = str(e)
-        await db.commit()
+        await _mark_failed(db, scenario, db_simulation, e)
         raise SimulationError(
             message="Simulation failed",
             detail=str(e)
         )
 
 
+@router.post("/simulations", response_model=APIResponse)
+async def create_simulation(
+    simulation: SimulationCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """Create and run a new simulation"""
+    scenario = await db.get(Scenario, simulation.scenario_id)
+    
+    if not scenario:
+        raise DataNotFoundError(f"Scenario {simulation.scenario_id} not found")
+    
+    return APIResponse(
+        success=True,
+        message="Simulation completed successfully",
+        data=await _run_simulation(db, scenario, simulation.input_data)
+    )
+
+
 @router.get("/simulations/{simulation_id}", response_model=APIResponse)
 async def get_simulation(
     simulation_id: int,
     db: AsyncSession = Depends(get_db)
 ):
     """Get simulation results"""
-    result = await db.execute(
-        select(Simulation).where(Simulation.id == simulation_id)
-    )
-    simulation = result.scalar_one_or_none()
+    simulation = await db.get(Simulation, simulation_id)
     
     if not simulation:
         raise DataNotFoundError(f"Simulation {simulation_id} not found")
@@ -224,7 +344,7 @@ async def get_simulation(
     return APIResponse(
         success=True,
         message="Simulation found",
-        data=SimulationResponse.model_validate(simulation).model_dump()
+        data=SimulationResponse.model_validate(simulation)
     )
 
 
@@ -234,17 +354,27 @@ async def list_scenario_simulations(
     db: AsyncSession = Depends(get_db)
 ):
     """List all simulations for a scenario"""
-    result = await db.execute(
-        select(Simulation)
-        .where(Simulation.scenario_id == scenario_id)
-        .order_by(Simulation.created_at.desc())
-    )
+    result = await db.execute(_list_simulations_stmt, {"scenario_id": scenario_id})
     simulations = result.scalars().all()
     
     return APIResponse(
         success=True,
         message=f"Found {len(simulations)} simulations",
-        data=[SimulationResponse.model_validate(s).model_dump() for s in simulations]
+        data=SIMULATION_LIST_ADAPTER.validate_python(simulations, from_attributes=True)
+    )
+
+
+@router.get("/scenarios/{scenario_id}/simulations/stream")
+async def stream_scenario_simulations(scenario_id: int):
+    """Stream all simulations for a scenario as NDJSON"""
+    stmt = (
+        select(Simulation)
+        .where(Simulation.scenario_id == scenario_id)
+        .order_by(Simulation.created_at.desc())
+    )
+    return StreamingResponse(
+        _stream_ndjson(stmt, SIMULATION_LIST_ADAPTER),
+        media_type="application/x-ndjson"
     )
 
 
@@ -262,12 +392,12 @@ async def quick_simulation(
     scenario = Scenario(
         user_id=user_id,
         name=f"Quick: {params.query[:50]}...",
-        decision_type=DBDecisionType(params.decision_type.value),
+        decision_type=params.decision_type.value,
         description=params.query
     )
     db.add(scenario)
-    await db.commit()
-    await db.refresh(scenario)
+    # Коммитится вместе с симуляцией в _run_simulation
+    await db.flush()
 
     # Формируем входные данные для симуляции
     simulation_input = SimulationInput(
@@ -276,10 +406,8 @@ async def quick_simulation(
         # monte_carlo_runs остаётся по умолчанию (1000)
     )
 
-    simulation_create = SimulationCreate(
-        scenario_id=scenario.id,
-        input_data=simulation_input
+    return APIResponse(
+        success=True,
+        message="Simulation completed successfully",
+        data=await _run_simulation(db, scenario, simulation_input)
     )
-
-    # Вызываем существующий эндпоинт создания симуляции
-    return await create_simulation(simulation_create, db)
\ No newline at end of file
@@ -9,7 +9,8 @@ class Settings(BaseSettings):
     model_config = ConfigDict(
         env_file=".env",
         case_sensitive=True,
-        extra="ignore"
+        extra="ignore",
+        frozen=True
     )
 
     # App
@@ -20,6 +21,10 @@ class Settings(BaseSettings):
     # Database
     # DATABASE_URL: str = "postgresql://postgres:postgres@db:5432/decision_simulator"
     DATABASE_URL: str = "sqlite+aiosqlite:///./test.db"  # <-- Добавьте :str
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # recycle connections every 30 minutes
 
     # Redis
     REDIS_URL: str = "redis://redis:6379/0"
@@ -38,12 +43,27 @@ class Settings(BaseSettings):
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    CORS_ORIGINS: str = "http://localhost:3000"  # comma-separated list of allowed origins
+
+    # Simulation workers
+    WEB_CONCURRENCY: int = 1  # uvicorn worker processes (set by the Dockerfile)
+    SIMULATION_POOL_WORKERS: int = 0  # per web worker; 0 = CPUs divided by WEB_CONCURRENCY
 
     # Cache
     CACHE_TTL_SECONDS: int = 86400  # 24 hours
 
+    # Logging
+    LOG_DIR: str = "logs"  # пустая строка — только stdout, без файлов
+    # Ротация внутри процесса. При нескольких воркерах (uvicorn --workers)
+    # выключить: файлы открываются через WatchedFileHandler и ротируются снаружи
+    LOG_ROTATE: bool = True
+
 
 
 @lru_cache()
 def get_settings() -> Settings:
-    return Settings()
\ No newline at end of file
+    return Settings()
+
+
+# Единственный экземпляр настроек: .env читается один раз при импорте
+settings = get_settings()
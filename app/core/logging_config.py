@@ -2,54 +2,88 @@
 Конфигурация логирования для приложения
 """
 import logging
+import queue
 import sys
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from typing import Optional
+from logging.handlers import RotatingFileHandler, WatchedFileHandler, QueueHandler, QueueListener
 
-# Создаем папку для логов
-LOG_DIR = Path("logs")
-LOG_DIR.mkdir(exist_ok=True)
+# Фоновый поток, который пишет записи из очереди в обработчики
+_listener: Optional[QueueListener] = None
 
 
-def setup_logging():
-    """Настройка логирования для приложения"""
+def _file_handler(path: Path, backup_count: int, rotate: bool) -> logging.Handler:
+    """
+    Файловый обработчик. RotatingFileHandler годится только для одного процесса;
+    WatchedFileHandler переоткрывает файл после внешней ротации (logrotate).
+    """
+    if rotate:
+        # Ротация по 10MB
+        return RotatingFileHandler(
+            path,
+            maxBytes=10_000_000,
+            backupCount=backup_count,
+            encoding='utf-8'
+        )
+    return WatchedFileHandler(path, encoding='utf-8')
+
+
+def setup_logging(debug: bool = False, log_dir: str = "logs", rotate: bool = True):
+    """
+    Настройка логирования для приложения.
+    Файловые обработчики работают в фоновом QueueListener, поэтому вызов
+    logger.info() в event loop только кладёт запись в очередь.
+    Вызывается из lifespan; повторный вызов (или уже настроенный корневой
+    логгер, например в pytest) ничего не добавляет.
+    Пустой log_dir отключает файлы; rotate=False — внешняя ротация для
+    нескольких процессов, пишущих в один каталог.
+    """
+    global _listener
+
+    root_logger = logging.getLogger()
+    if _listener is not None or root_logger.handlers:
+        return root_logger
 
     # Формат логов
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
 
-    # Файловый обработчик (ротация по 10MB, максимум 5 файлов)
-    file_handler = RotatingFileHandler(
-        LOG_DIR / 'app.log',
-        maxBytes=10_000_000,  # 10MB
-        backupCount=5,
-        encoding='utf-8'
-    )
-    file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(formatter)
-
     # Консольный обработчик
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
 
-    # Обработчик ошибок
-    error_handler = RotatingFileHandler(
-        LOG_DIR / 'errors.log',
-        maxBytes=10_000_000,
-        backupCount=3,
-        encoding='utf-8'
-    )
-    error_handler.setLevel(logging.ERROR)
-    error_handler.setFormatter(formatter)
+    queued_handlers = []
+    if log_dir:
+        path = Path(log_dir)
+        path.mkdir(parents=True, exist_ok=True)
+
+        # Файловый обработчик (максимум 5 файлов при ротации)
+        file_handler = _file_handler(path / 'app.log', backup_count=5, rotate=rotate)
+        file_handler.setLevel(logging.INFO)
+        file_handler.setFormatter(formatter)
+
+        # Обработчик ошибок
+        error_handler = _file_handler(path / 'errors.log', backup_count=3, rotate=rotate)
+        error_handler.setLevel(logging.ERROR)
+        error_handler.setFormatter(formatter)
+
+        queued_handlers += [file_handler, error_handler]
 
     # Настраиваем корневой логгер
-    root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
-    root_logger.addHandler(error_handler)
+
+    log_queue = queue.Queue(-1)
+    root_logger.addHandler(QueueHandler(log_queue))
+    if debug:
+        # В DEBUG консоль пишем сразу, чтобы вывод не отставал
+        root_logger.addHandler(console_handler)
+    else:
+        queued_handlers.append(console_handler)
+
+    _listener = QueueListener(log_queue, *queued_handlers, respect_handler_level=True)
+    _listener.start()
 
     # Настраиваем логгеры для наших модулей
     app_logger = logging.getLogger('app')
@@ -66,6 +100,14 @@ def setup_logging():
     return root_logger
 
 
+def stop_logging():
+    """Дописать оставшиеся записи из очереди и остановить фоновый поток"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
 # Создаем функцию для получения логгера
 def get_logger(name: str) -> logging.Logger:
     """Получить логгер по имени"""
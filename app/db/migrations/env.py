@@ -0,0 +1,41 @@
+"""
+Alembic environment.
+init_db() passes its own connection in config.attributes; the alembic CLI
+(alembic.ini at the project root) connects with the application's engine.
+"""
+import asyncio
+
+from alembic import context
+
+from app.models.database import Base
+
+config = context.config
+target_metadata = Base.metadata
+
+
+def _run_migrations(connection):
+    # SQLite cannot ALTER columns in place: batch mode recreates the table
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def _run_migrations_online():
+    from app.db.session import dispose_engine, get_engine
+
+    async with get_engine().connect() as connection:
+        await connection.run_sync(_run_migrations)
+        await connection.commit()
+    await dispose_engine()
+
+
+if context.is_offline_mode():
+    from app.db.session import DATABASE_URL
+
+    context.configure(url=DATABASE_URL, target_metadata=target_metadata, literal_binds=True, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+elif config.attributes.get("connection") is not None:
+    _run_migrations(config.attributes["connection"])
+else:
+    asyncio.run(_run_migrations_online())
@@ -0,0 +1,81 @@
+"""Baseline schema (tables created by Base.metadata.create_all before migrations)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-14 08:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_DECISION_TYPES = ("RELOCATION", "PURCHASE", "JOB", "INVESTMENT")
+_SIMULATION_STATUSES = ("PENDING", "RUNNING", "COMPLETED", "FAILED")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("hashed_password", sa.String(255), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "scenarios",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("decision_type", sa.Enum(*_DECISION_TYPES, name="decisiontype"), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_scenarios_id", "scenarios", ["id"])
+
+    op.create_table(
+        "simulations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("scenario_id", sa.Integer(), sa.ForeignKey("scenarios.id"), nullable=False),
+        sa.Column("input_data", sa.JSON(), nullable=False),
+        sa.Column("result_json", sa.JSON()),
+        sa.Column("status", sa.Enum(*_SIMULATION_STATUSES, name="simulationstatus")),
+        sa.Column("error_message", sa.Text()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("completed_at", sa.DateTime()),
+    )
+    op.create_index("ix_simulations_id", "simulations", ["id"])
+
+    op.create_table(
+        "cached_data",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cache_key", sa.String(255), nullable=False),
+        sa.Column("data", sa.JSON(), nullable=False),
+        sa.Column("source", sa.String(100)),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_cached_data_id", "cached_data", ["id"])
+    op.create_index("ix_cached_data_cache_key", "cached_data", ["cache_key"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("cached_data")
+    op.drop_table("simulations")
+    op.drop_table("scenarios")
+    op.drop_table("users")
+    sa.Enum(name="simulationstatus").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="decisiontype").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,55 @@
+"""Timezone-aware created_at/updated_at generated by the database
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-14 08:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> timestamp columns; created_at becomes NOT NULL, the rest stay nullable
+_COLUMNS = {
+    "users": ("created_at",),
+    "scenarios": ("created_at", "updated_at"),
+    "simulations": ("created_at", "completed_at"),
+    "cached_data": ("created_at",),
+}
+_SERVER_DEFAULT = ("created_at", "updated_at")
+
+
+def _alter(aware: bool) -> None:
+    for table, columns in _COLUMNS.items():
+        with op.batch_alter_table(table) as batch:
+            for column in columns:
+                # Stored values are naive UTC (datetime.utcnow)
+                using = f"{column} AT TIME ZONE 'UTC'"
+                batch.alter_column(
+                    column,
+                    existing_type=sa.DateTime(timezone=not aware),
+                    type_=sa.DateTime(timezone=aware),
+                    server_default=sa.func.now() if aware and column in _SERVER_DEFAULT else None,
+                    nullable=not (aware and column == "created_at"),
+                    postgresql_using=using,
+                )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in _COLUMNS:
+        op.execute(f"UPDATE {table} SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+    _alter(aware=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _alter(aware=False)
@@ -0,0 +1,66 @@
+"""decision_type/status as String(16) holding enum values, with CHECK constraints
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-14 08:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table, column, PostgreSQL enum type, check constraint, values
+_COLUMNS = (
+    ("scenarios", "decision_type", "decisiontype", "ck_scenarios_decision_type",
+     ("relocation", "purchase", "job", "investment")),
+    ("simulations", "status", "simulationstatus", "ck_simulations_status",
+     ("pending", "running", "completed", "failed")),
+)
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, column, enum_name, constraint, values in _COLUMNS:
+        if not _is_postgresql():
+            # SQLEnum stored member names; PostgreSQL rewrites them in USING below
+            op.execute(f"UPDATE {table} SET {column} = lower({column})")
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column(
+                column,
+                existing_type=sa.Enum(*(v.upper() for v in values), name=enum_name),
+                type_=sa.String(16),
+                postgresql_using=f"lower({column}::text)",
+            )
+            batch.create_check_constraint(constraint, f"{column} IN ({', '.join(map(repr, values))})")
+        if _is_postgresql():
+            op.execute(f"DROP TYPE IF EXISTS {enum_name}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, column, enum_name, constraint, values in _COLUMNS:
+        enum = sa.Enum(*(v.upper() for v in values), name=enum_name)
+        enum.create(op.get_bind(), checkfirst=True)
+        with op.batch_alter_table(table) as batch:
+            batch.drop_constraint(constraint, type_="check")
+        if not _is_postgresql():
+            op.execute(f"UPDATE {table} SET {column} = upper({column})")
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column(
+                column,
+                existing_type=sa.String(16),
+                type_=enum,
+                postgresql_using=f"upper({column})::{enum_name}",
+            )
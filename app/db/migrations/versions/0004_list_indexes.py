@@ -0,0 +1,29 @@
+"""Composite (owner, created_at) indexes for the list endpoints
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-14 08:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_scenarios_user_created", "scenarios", ["user_id", "created_at"])
+    op.create_index("ix_simulations_scenario_created", "simulations", ["scenario_id", "created_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_simulations_scenario_created", table_name="simulations")
+    op.drop_index("ix_scenarios_user_created", table_name="scenarios")
@@ -1,10 +1,13 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+import orjson
+from typing import Optional
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from app.core.config import get_settings
+from app.core.config import settings
 from app.models.database import Base
 
-settings = get_settings()
-
 # Convert sync URL to async
 #DATABASE_URL = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
 
@@ -16,23 +19,111 @@ if settings.DEBUG:
 else:
     DATABASE_URL = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
 
-engine = create_async_engine(DATABASE_URL, echo=settings.DEBUG, connect_args={"check_same_thread": False})
 
+def _json_serializer(value) -> str:
+    """orjson for JSON columns; simulation results may carry numpy scalars"""
+    return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+
+
+def _create_engine() -> AsyncEngine:
+    if DATABASE_URL.startswith("sqlite"):
+        # check_same_thread is a sqlite3 argument; asyncpg rejects it
+        return create_async_engine(
+            DATABASE_URL,
+            echo=settings.DEBUG,
+            json_serializer=_json_serializer,
+            json_deserializer=orjson.loads,
+            connect_args={"check_same_thread": False}
+        )
+    return create_async_engine(
+        DATABASE_URL,
+        echo=settings.DEBUG,
+        json_serializer=_json_serializer,
+        json_deserializer=orjson.loads,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=True,
+        pool_recycle=settings.DB_POOL_RECYCLE
+    )
+
+
+_engine: Optional[AsyncEngine] = None
+
+# Bound to the engine by get_engine(); use get_sessionmaker() to open sessions
 AsyncSessionLocal = async_sessionmaker(
-    engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
 
 
+def get_engine() -> AsyncEngine:
+    """
+    Engine of the current process, created on first use.
+    Not created at import so that pre-forked workers (uvicorn --workers,
+    Celery prefork) never share pooled connections across fork().
+    """
+    global _engine
+    if _engine is None:
+        _engine = _create_engine()
+        AsyncSessionLocal.configure(bind=_engine)
+    return _engine
+
+
+def get_sessionmaker() -> async_sessionmaker:
+    """Session factory bound to the current process's engine"""
+    get_engine()
+    return AsyncSessionLocal
+
+
+async def dispose_engine():
+    """
+    Close the pooled connections and forget the engine.
+    Pooled connections belong to the event loop that opened them; callers that
+    run each job in its own loop (Celery tasks) dispose before the loop closes.
+    """
+    global _engine
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+
+
 async def get_db() -> AsyncSession:
-    async with AsyncSessionLocal() as session:
+    async with get_sessionmaker()() as session:
         try:
             yield session
         finally:
             await session.close()
 
 
+# pg_advisory_xact_lock key: workers starting together migrate one at a time
+_MIGRATION_LOCK_ID = 7194305
+
+# Revision matching the schema that create_all() produced before migrations existed
+_BASELINE_REVISION = "0001"
+
+
+def _migrate(connection):
+    """Bring the schema to the latest migration"""
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _MIGRATION_LOCK_ID})
+
+    config = Config()
+    config.set_main_option("script_location", "app.db:migrations")
+    config.attributes["connection"] = connection
+
+    tables = set(inspect(connection).get_table_names())
+    if "alembic_version" in tables:
+        command.upgrade(config, "head")
+    elif "scenarios" in tables:
+        # Database created by create_all() of the baseline models
+        command.stamp(config, _BASELINE_REVISION)
+        command.upgrade(config, "head")
+    else:
+        Base.metadata.create_all(connection)
+        command.stamp(config, "head")
+
+
 async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    async with get_engine().begin() as conn:
+        await conn.run_sync(_migrate)
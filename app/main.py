@@ -1,14 +1,17 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse, HTMLResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 
-from app.core.config import get_settings
+from app.core.config import settings
+from app.core.logging_config import setup_logging, stop_logging
 from app.core.exceptions import (
     DecisionSimulatorException,
     custom_exception_handler,
@@ -17,28 +20,40 @@ from app.core.exceptions import (
     general_exception_handler
 )
 from app.db.session import init_db
+from app.services.simulation_engine import shutdown_process_pool, warm_process_pool
+from app.services.llm_cache import close_redis
+from app.services.llm_service import close_http_client
 from app.api.endpoints import router as api_router
 
-settings = get_settings()
-
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG if settings.DEBUG else logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Application lifespan events"""
+    """
+    Application lifespan events.
+    Runs once per worker process, so the app can be served pre-forked:
+        uvicorn app.main:app --workers $(nproc) --loop uvloop --http httptools
+    The DB engine and the simulation pool are created in each worker, never
+    before the fork.
+    """
     # Startup
+    setup_logging(debug=settings.DEBUG, log_dir=settings.LOG_DIR, rotate=settings.LOG_ROTATE)
     logger.info("Starting AI Decision Simulator...")
     await init_db()
     logger.info("Database initialized")
+    # One pool per worker process, shared by all requests; workers spawned up
+    # front in a thread so the loop is not blocked while they start
+    await asyncio.get_running_loop().run_in_executor(None, warm_process_pool)
+    logger.info("Simulation process pool started")
     yield
     # Shutdown
     logger.info("Shutting down AI Decision Simulator...")
+    # Waits for running simulations to finish: in a thread, like the warm-up
+    await asyncio.get_running_loop().run_in_executor(None, shutdown_process_pool)
+    await close_redis()
+    await close_http_client()
+    stop_logging()
 
 
 app = FastAPI(
@@ -63,12 +78,16 @@ app = FastAPI(
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure for production
+    allow_origins=[origin.strip() for origin in settings.CORS_ORIGINS.split(",") if origin.strip()],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "DELETE"],
+    allow_headers=["authorization", "content-type"],
+    max_age=86400,  # браузер кэширует preflight на сутки
 )
 
+# Сжатие ответов: result_json с Monte Carlo — большой и хорошо сжимаемый JSON
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Exception handlers
 app.add_exception_handler(DecisionSimulatorException, custom_exception_handler)
 app.add_exception_handler(StarletteHTTPException, http_exception_handler)
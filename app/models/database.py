@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Text, Index, CheckConstraint, func
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import relationship
-from datetime import datetime
+from datetime import datetime, timezone
 import enum
 
 Base = declarative_base()
@@ -21,13 +21,22 @@ class SimulationStatus(str, enum.Enum):
     FAILED = "failed"
 
 
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _in_values(column: str, values: type[enum.Enum]) -> str:
+    """SQL CHECK expression restricting column to the enum's values"""
+    return f"{column} IN ({', '.join(repr(v.value) for v in values)})"
+
+
 class User(Base):
     __tablename__ = "users"
     
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String(255), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=_utcnow, server_default=func.now(), nullable=False)
     
     scenarios = relationship("Scenario", back_populates="user")
 
@@ -38,14 +47,20 @@ class Scenario(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     name = Column(String(255), nullable=False)
-    decision_type = Column(SQLEnum(DecisionType), nullable=False)
+    decision_type = Column(String(16), nullable=False)  # DecisionType value
     description = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=_utcnow, server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=_utcnow, server_default=func.now(), onupdate=_utcnow)
     
     user = relationship("User", back_populates="scenarios")
     simulations = relationship("Simulation", back_populates="scenario")
 
+    # Backs list_scenarios: WHERE user_id = ? ORDER BY created_at DESC
+    __table_args__ = (
+        Index("ix_scenarios_user_created", "user_id", "created_at"),
+        CheckConstraint(_in_values("decision_type", DecisionType), name="ck_scenarios_decision_type"),
+    )
+
 
 class Simulation(Base):
     __tablename__ = "simulations"
@@ -54,13 +69,19 @@ class Simulation(Base):
     scenario_id = Column(Integer, ForeignKey("scenarios.id"), nullable=False)
     input_data = Column(JSON, nullable=False)  # Structured input from LLM
     result_json = Column(JSON)  # Simulation results
-    status = Column(SQLEnum(SimulationStatus), default=SimulationStatus.PENDING)
+    status = Column(String(16), default=SimulationStatus.PENDING.value)  # SimulationStatus value
     error_message = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    completed_at = Column(DateTime)
+    created_at = Column(DateTime(timezone=True), default=_utcnow, server_default=func.now(), nullable=False)
+    completed_at = Column(DateTime(timezone=True))
     
     scenario = relationship("Scenario", back_populates="simulations")
 
+    # Backs list_scenario_simulations: WHERE scenario_id = ? ORDER BY created_at DESC
+    __table_args__ = (
+        Index("ix_simulations_scenario_created", "scenario_id", "created_at"),
+        CheckConstraint(_in_values("status", SimulationStatus), name="ck_simulations_status"),
+    )
+
 
 class CachedData(Base):
     """Cache for external API data (cost of living, taxes, etc.)"""
@@ -71,4 +92,4 @@ class CachedData(Base):
     data = Column(JSON, nullable=False)
     source = Column(String(100))
     expires_at = Column(DateTime, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=_utcnow, server_default=func.now(), nullable=False)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, TypeAdapter
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -134,6 +134,11 @@ class SimulationResponse(BaseModel):
         from_attributes = True
 
 
+# Built once: validates a whole result set from ORM rows in a single call
+SCENARIO_LIST_ADAPTER = TypeAdapter(List[ScenarioResponse])
+SIMULATION_LIST_ADAPTER = TypeAdapter(List[SimulationResponse])
+
+
 # ========== Модель для параметров быстрой симуляции (query) ==========
 class QuickSimParams(BaseModel):
     """Query parameters for quick simulation endpoint /api/v1/simulate"""
@@ -1,10 +1,19 @@
+import asyncio
+import orjson
 from celery import Celery
-from datetime import datetime
-import json
+from datetime import datetime, timezone
+from kombu.serialization import register
 
-from app.core.config import get_settings
+from app.core.config import settings
 
-settings = get_settings()
+# orjson codec for task payloads and results (simulation results carry numpy scalars)
+register(
+    "orjson",
+    lambda obj: orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode(),
+    orjson.loads,
+    content_type="application/x-orjson",
+    content_encoding="utf-8"
+)
 
 celery_app = Celery(
     "decision_simulator",
@@ -13,32 +22,56 @@ celery_app = Celery(
 )
 
 celery_app.conf.update(
-    task_serializer="json",
-    accept_content=["json"],
-    result_serializer="json",
+    task_serializer="orjson",
+    accept_content=["orjson", "json"],
+    result_serializer="orjson",
+    result_accept_content=["orjson", "json"],
     timezone="UTC",
     enable_utc=True,
     task_track_started=True,
     task_time_limit=600,  # 10 minutes max
-    worker_prefetch_multiplier=1,
+    # Tasks mostly wait on LLM / market-data I/O: keep a second task reserved
+    worker_prefetch_multiplier=2,
+    # Ack after the task finishes so a crashed worker's task is redelivered
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
 )
 
 
+def _run_async(coro):
+    """
+    Run a task coroutine in a fresh event loop (asyncio.run).
+    The DB engine and the shared HTTP client are closed before that loop
+    closes, so the next task never picks up connections bound to a dead loop.
+    """
+    from app.db.session import dispose_engine
+    from app.services.llm_service import close_http_client
+
+    async def _main():
+        try:
+            return await coro
+        finally:
+            await close_http_client()
+            await dispose_engine()
+
+    return asyncio.run(_main())
+
+
 @celery_app.task(bind=True, name="run_heavy_simulation")
 def run_heavy_simulation(self, simulation_id: int, input_data: dict):
     """
     Background task for heavy simulations (Monte Carlo with many runs).
     Use this for simulations that might take > 30 seconds.
     """
-    from app.db.session import AsyncSessionLocal
+    from app.db.session import get_sessionmaker
     from app.models.database import Simulation, Scenario, SimulationStatus
     from app.services.simulation_engine import SimulationEngine
     from app.services.llm_service import LLMService, DataService
     from app.schemas.schemas import DecisionType
-    import asyncio
     
     async def _run():
-        async with AsyncSessionLocal() as db:
+        session_factory = get_sessionmaker()
+        async with session_factory() as db:
             # Get simulation
             from sqlalchemy import select
             result = await db.execute(
@@ -56,8 +89,8 @@ def run_heavy_simulation(self, simulation_id: int, input_data: dict):
             scenario = result.scalar_one()
             
             try:
-                simulation.status = SimulationStatus.RUNNING
-                await db.commit()
+                # Progress is reported through task state; the row is committed once at the end
+                simulation.status = SimulationStatus.RUNNING.value
                 
                 # Update task progress
                 self.update_state(state="PROGRESS", meta={"step": "structuring"})
@@ -65,7 +98,7 @@ def run_heavy_simulation(self, simulation_id: int, input_data: dict):
                 llm_service = LLMService()
                 structured_data = await llm_service.structure_query(
                     input_data["query"],
-                    scenario.decision_type.value
+                    scenario.decision_type
                 )
                 
                 self.update_state(state="PROGRESS", meta={"step": "fetching_data"})
@@ -73,13 +106,13 @@ def run_heavy_simulation(self, simulation_id: int, input_data: dict):
                 data_service = DataService(db)
                 external_data = {}
                 
-                if scenario.decision_type.value == "relocation":
-                    cities = structured_data.get("cities", [])
-                    external_data["cost_of_living"] = {}
-                    external_data["tax_rates"] = {}
-                    for city in cities:
-                        external_data["cost_of_living"][city.lower()] = await data_service.get_cost_of_living(city)
-                        external_data["tax_rates"][city.lower()] = await data_service.get_tax_rates(city)
+                if scenario.decision_type == DecisionType.RELOCATION:
+                    # One cache query for every city instead of 2N sequential lookups
+                    cost_of_living, tax_rates = await data_service.get_city_data(
+                        structured_data.get("cities", [])
+                    )
+                    external_data["cost_of_living"] = cost_of_living
+                    external_data["tax_rates"] = tax_rates
                 
                 self.update_state(state="PROGRESS", meta={"step": "running_simulation"})
                 
@@ -88,8 +121,9 @@ def run_heavy_simulation(self, simulation_id: int, input_data: dict):
                     monte_carlo_runs=input_data.get("monte_carlo_runs", 1000)
                 )
                 
-                simulation_results = await engine.run_simulation(
-                    DecisionType(scenario.decision_type.value),
+                # Sync and CPU-bound; this task's loop has nothing else to serve meanwhile
+                simulation_results = engine.run_simulation(
+                    DecisionType(scenario.decision_type),
                     structured_data,
                     external_data
                 )
@@ -108,37 +142,39 @@ def run_heavy_simulation(self, simulation_id: int, input_data: dict):
                 }
                 
                 simulation.result_json = final_results
-                simulation.status = SimulationStatus.COMPLETED
-                simulation.completed_at = datetime.utcnow()
+                simulation.status = SimulationStatus.COMPLETED.value
+                simulation.completed_at = datetime.now(timezone.utc)
                 await db.commit()
                 
                 return {"success": True, "simulation_id": simulation_id}
                 
             except Exception as e:
-                simulation.status = SimulationStatus.FAILED
+                # The session may be unusable after a failed flush; the row itself is committed
+                await db.rollback()
+                simulation.status = SimulationStatus.FAILED.value
                 simulation.error_message = str(e)
                 await db.commit()
                 return {"error": str(e)}
     
-    return asyncio.get_event_loop().run_until_complete(_run())
+    return _run_async(_run())
 
 
 @celery_app.task(name="cleanup_old_cache")
 def cleanup_old_cache():
     """Periodic task to clean up expired cache entries"""
-    from app.db.session import AsyncSessionLocal
+    from app.db.session import get_sessionmaker
     from app.models.database import CachedData
     from sqlalchemy import delete
-    import asyncio
     
     async def _cleanup():
-        async with AsyncSessionLocal() as db:
+        session_factory = get_sessionmaker()
+        async with session_factory() as db:
             await db.execute(
                 delete(CachedData).where(CachedData.expires_at < datetime.utcnow())
             )
             await db.commit()
     
-    asyncio.get_event_loop().run_until_complete(_cleanup())
+    _run_async(_cleanup())
     return {"status": "cleaned"}
 
 
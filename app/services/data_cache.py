@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, lambda_stmt, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.database import CachedData
+
+
+# One probe of the unique cache_key index; only the payload column is fetched
+_get_cached_stmt = lambda_stmt(
+    lambda: select(CachedData.data).where(
+        CachedData.cache_key == bindparam("cache_key"),
+        CachedData.expires_at > bindparam("now")
+    )
+)
+
+# INSERT ... ON CONFLICT DO UPDATE constructs of the supported backends
+_UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+async def get_cached(db: AsyncSession, cache_key: str) -> Optional[Dict[str, Any]]:
+    """Get an unexpired entry from the cached_data table"""
+    result = await db.execute(
+        _get_cached_stmt,
+        {"cache_key": cache_key, "now": datetime.utcnow()}
+    )
+    return result.scalar()
+
+
+async def get_cached_many(db: AsyncSession, cache_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Get several unexpired entries with a single query"""
+    if not cache_keys:
+        return {}
+    result = await db.execute(
+        select(CachedData.cache_key, CachedData.data).where(
+            CachedData.cache_key.in_(cache_keys),
+            CachedData.expires_at > datetime.utcnow()
+        )
+    )
+    return dict(result.all())
+
+
+async def set_cached(db: AsyncSession, cache_key: str, data: Dict[str, Any], source: str):
+    """Store an entry for CACHE_TTL_SECONDS (persisted with the caller's commit)"""
+    await set_cached_many(db, [(cache_key, data)], source)
+
+
+async def set_cached_many(
+    db: AsyncSession,
+    entries: List[Tuple[str, Dict[str, Any]]],
+    source: str
+):
+    """
+    Store several (cache_key, data) entries at once.
+    One upsert on the unique cache_key: a row written meanwhile by a concurrent
+    request (or an expired one) is overwritten instead of failing the
+    transaction. Nothing is committed here: the rows go out with the caller's
+    single commit.
+    """
+    if not entries:
+        return
+    expires_at = datetime.utcnow() + timedelta(seconds=settings.CACHE_TTL_SECONDS)
+
+    insert = _UPSERT_INSERTS[db.get_bind().dialect.name]
+    stmt = insert(CachedData).values([
+        {
+            "cache_key": cache_key,
+            "data": data,
+            "source": source,
+            "expires_at": expires_at
+        }
+        for cache_key, data in entries
+    ])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[CachedData.cache_key],
+        set_={
+            "data": stmt.excluded.data,
+            "source": stmt.excluded.source,
+            "expires_at": stmt.excluded.expires_at
+        }
+    ))
@@ -1,11 +1,14 @@
-import yfinance as yf
 import pandas as pd
 
+from app.services.financial_data_service import get_history
+
 async def get_stock_data(ticker: str, years: int = 10):
-    stock = yf.Ticker(ticker)
-    hist = stock.history(period=f"{years}y")
+    hist = get_history(ticker, f"{years}y")
+    returns = hist["Close"].pct_change().dropna().to_numpy()
+    avg_return = returns.mean()
+    volatility = returns.std(ddof=1)  # как у pandas .std()
     return {
-        "avg_return": hist["Close"].pct_change().mean(),
-        "volatility": hist["Close"].pct_change().std(),
-        "sharpe_ratio": hist["Close"].pct_change().mean() / hist["Close"].pct_change().std()
+        "avg_return": avg_return,
+        "volatility": volatility,
+        "sharpe_ratio": avg_return / volatility
     }
\ No newline at end of file
@@ -1,59 +1,131 @@
+import asyncio
+import threading
+import time
 import yfinance as yf
 import pandas as pd
-from typing import Dict, Any, List
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.data_cache import get_cached, set_cached
+
+# Price histories are reused for a day; at most this many symbols/periods are kept
+HISTORY_TTL_SECONDS = 86400
+HISTORY_CACHE_SIZE = 128
+
+_history_cache: Dict[Tuple[str, str], Tuple[float, pd.DataFrame]] = {}
+# get_history runs in executor threads
+_history_lock = threading.Lock()
+
+
+@lru_cache(maxsize=HISTORY_CACHE_SIZE)
+def get_ticker(symbol: str) -> yf.Ticker:
+    """Shared yf.Ticker per symbol (each one sets up its own HTTP session)"""
+    return yf.Ticker(symbol)
+
+
+def get_history(symbol: str, period: str) -> pd.DataFrame:
+    """
+    Blocking history() call with a daily TTL cache.
+    Empty frames are not cached so a transient Yahoo failure is retried.
+    The returned frame is shared: callers must not modify it.
+    """
+    key = (symbol, period)
+    with _history_lock:
+        cached = _history_cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] < HISTORY_TTL_SECONDS:
+        return cached[1]
+
+    # Fetched outside the lock so other symbols are not serialized behind Yahoo
+    hist = get_ticker(symbol).history(period=period)
+    if not hist.empty:
+        with _history_lock:
+            _history_cache.pop(key, None)
+            if len(_history_cache) >= HISTORY_CACHE_SIZE:
+                # Drop the oldest entry (dicts keep insertion order)
+                _history_cache.pop(next(iter(_history_cache)))
+            _history_cache[key] = (time.monotonic(), hist)
+    return hist
 
 
 class FinancialDataService:
     """Service for fetching real financial data"""
 
     @staticmethod
-    async def get_stock_data(ticker: str, years: int = 10) -> Dict[str, Any]:
+    async def get_stock_data(
+        ticker: str,
+        years: int = 10,
+        db: Optional[AsyncSession] = None
+    ) -> Dict[str, Any]:
         """
         Get historical data for a stock
         Args:
             ticker: Stock symbol (e.g., 'AAPL', 'GOOGL', 'MSFT')
             years: Number of years of historical data
+            db: Optional session; metrics are then cached in cached_data
+                (persisted with the caller's commit)
         """
-        try:
-            stock = yf.Ticker(ticker)
-            hist = stock.history(period=f"{years}y")
+        cache_key = f"stock_{ticker}_{years}y"
+        if db is not None:
+            cached = await get_cached(db, cache_key)
+            if cached:
+                return cached
 
-            if hist.empty:
-                return {
-                    "error": f"No data found for {ticker}",
-                    "ticker": ticker,
-                    "current_price": 0,
-                    "returns": 0,
-                    "volatility": 0
-                }
+        try:
+            hist = get_history(ticker, f"{years}y")
+            data = FinancialDataService._compute_metrics(ticker, hist, years)
+        except Exception as e:
+            return {
+                "error": str(e),
+                "ticker": ticker
+            }
 
-            # Calculate metrics
-            returns = hist["Close"].pct_change().dropna()
-            current_price = hist["Close"].iloc[-1]
+        if db is not None and "error" not in data:
+            await set_cached(db, cache_key, data, source="yfinance")
+        return data
 
+    @staticmethod
+    def _compute_metrics(ticker: str, hist: pd.DataFrame, years: int) -> Dict[str, Any]:
+        """Calculate stock metrics from an already fetched price history"""
+        if hist.empty:
             return {
+                "error": f"No data found for {ticker}",
                 "ticker": ticker,
-                "current_price": round(current_price, 2),
-                "historical_data": {
-                    "avg_annual_return": round(returns.mean() * 252, 4),
-                    "annual_volatility": round(returns.std() * np.sqrt(252), 4),
-                    "sharpe_ratio": round(returns.mean() / returns.std() * np.sqrt(252), 2),
-                    "max_drawdown": round((hist["Close"] / hist["Close"].cummax() - 1).min(), 4),
-                    "total_return": round((current_price / hist["Close"].iloc[0] - 1) * 100, 2)
-                },
-                "metadata": {
-                    "period_years": years,
-                    "data_points": len(hist),
-                    "last_updated": datetime.utcnow().isoformat()
-                }
+                "current_price": 0,
+                "returns": 0,
+                "volatility": 0
             }
-        except Exception as e:
-            return {
-                "error": str(e),
-                "ticker": ticker
+
+        # Calculate metrics
+        close = hist["Close"].dropna().to_numpy()
+        returns = close[1:] / close[:-1] - 1
+        returns_mean = returns.mean()
+        returns_std = returns.std(ddof=1)
+        current_price = close[-1]
+
+        # Max drawdown in one buffer: running peaks, then close / peak in place
+        drawdown = np.maximum.accumulate(close)
+        np.divide(close, drawdown, out=drawdown)
+        max_drawdown = float(drawdown.min()) - 1.0
+
+        return {
+            "ticker": ticker,
+            "current_price": round(current_price, 2),
+            "historical_data": {
+                "avg_annual_return": round(returns_mean * 252, 4),
+                "annual_volatility": round(returns_std * np.sqrt(252), 4),
+                "sharpe_ratio": round(returns_mean / returns_std * np.sqrt(252), 2),
+                "max_drawdown": round(max_drawdown, 4),
+                "total_return": round((current_price / close[0] - 1) * 100, 2)
+            },
+            "metadata": {
+                "period_years": years,
+                "data_points": len(hist),
+                "last_updated": datetime.utcnow().isoformat()
             }
+        }
 
     @staticmethod
     async def get_multiple_stocks_data(tickers: List[str], years: int = 5) -> Dict[str, Any]:
@@ -61,22 +133,35 @@ class FinancialDataService:
         all_data = {}
         prices_df = pd.DataFrame()
 
-        for ticker in tickers:
-            stock_data = await FinancialDataService.get_stock_data(ticker, years)
+        # yfinance is blocking: fetch all tickers concurrently in threads,
+        # one history() call per ticker shared by metrics and correlation
+        histories = await asyncio.gather(
+            *[asyncio.to_thread(get_history, ticker, f"{years}y") for ticker in tickers],
+            return_exceptions=True
+        )
+
+        for ticker, hist in zip(tickers, histories):
+            try:
+                if isinstance(hist, Exception):
+                    raise hist
+                stock_data = FinancialDataService._compute_metrics(ticker, hist, years)
+            except Exception as e:
+                stock_data = {"error": str(e), "ticker": ticker}
+
             if "error" not in stock_data:
                 all_data[ticker] = stock_data
-
-                # Get price history for correlation
-                stock = yf.Ticker(ticker)
-                hist = stock.history(period=f"{years}y")
-                if not hist.empty:
-                    prices_df[ticker] = hist["Close"]
+                # float32 halves the memory traffic of pct_change() + corr()
+                prices_df[ticker] = hist["Close"].astype(np.float32)
 
         # Calculate correlation matrix if we have multiple tickers
         correlation_matrix = {}
         if len(prices_df.columns) > 1:
             corr = prices_df.pct_change().corr()
-            correlation_matrix = corr.where(np.triu(np.ones(corr.shape), k=1).astype(bool)).stack().to_dict()
+            # Upper triangle without the diagonal: each pair once
+            values = corr.to_numpy()
+            rows, cols = np.triu_indices_from(values, k=1)
+            labels = corr.columns.to_numpy()
+            correlation_matrix = dict(zip(zip(labels[rows], labels[cols]), values[rows, cols]))
 
         return {
             "stocks": all_data,
@@ -90,20 +175,16 @@ class FinancialDataService:
         if not stocks_data:
             return {}
 
-        returns = []
-        volatilities = []
-
-        for ticker, data in stocks_data.items():
-            if "historical_data" in data:
-                returns.append(data["historical_data"]["avg_annual_return"])
-                volatilities.append(data["historical_data"]["annual_volatility"])
-
-        if not returns:
+        historical = [data["historical_data"] for data in stocks_data.values() if "historical_data" in data]
+        if not historical:
             return {}
 
+        returns = np.fromiter((h["avg_annual_return"] for h in historical), dtype=np.float64, count=len(historical))
+        volatilities = np.fromiter((h["annual_volatility"] for h in historical), dtype=np.float64, count=len(historical))
+
         # Simple equally weighted portfolio metrics
-        avg_return = np.mean(returns)
-        avg_volatility = np.mean(volatilities)
+        avg_return = returns.mean()
+        avg_volatility = volatilities.mean()
 
         return {
             "expected_return": round(avg_return, 4),
@@ -124,8 +205,9 @@ class FinancialDataService:
             }
 
             ticker = tickers.get(bond_type, "^TNX")
-            bond = yf.Ticker(ticker)
-            hist = bond.history(period="1mo")
+            # Only the last close is needed: 5 days always covers a trading day.
+            # fast_info["last_price"] is not lighter: it downloads a year of prices
+            hist = get_history(ticker, "5d")
 
             if hist.empty:
                 return {
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence
+
+from pydantic import TypeAdapter, ValidationError
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.services.data_cache import get_cached, set_cached
+
+logger = logging.getLogger(__name__)
+
+# Bump when STRUCTURING_PROMPT / REPORT_PROMPT change so old answers are not reused
+PROMPT_VERSION = "v1"
+
+_response_adapter = TypeAdapter(Dict[str, Any])
+_redis: Optional[aioredis.Redis] = None
+
+
+def _get_redis() -> aioredis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = aioredis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=0.5,
+            socket_timeout=0.5
+        )
+    return _redis
+
+
+def make_cache_key(key_parts: Sequence[Any]) -> str:
+    """Content-addressed key: sha256 of the canonical JSON of key_parts"""
+    payload = json.dumps(key_parts, sort_keys=True, default=str)
+    return f"llm_{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+def _validate(raw: Any) -> Optional[Dict[str, Any]]:
+    try:
+        return _response_adapter.validate_python(raw)
+    except ValidationError:
+        return None
+
+
+async def cached_call(
+    key_parts: Sequence[Any],
+    coro_factory: Callable[[], Awaitable[Dict[str, Any]]],
+    db: Optional[AsyncSession] = None
+) -> Dict[str, Any]:
+    """
+    Return a cached LLM response for key_parts or compute and store it.
+    Lookup order: Redis, then the cached_data table (if a session is given).
+    Redis failures never fail the call. The DB entry is an upsert persisted
+    with the caller's next commit, so concurrent identical misses do not
+    collide on the unique cache_key.
+    """
+    cache_key = make_cache_key(key_parts)
+
+    try:
+        raw = await _get_redis().get(cache_key)
+        if raw is not None:
+            hit = _validate(json.loads(raw))
+            if hit is not None:
+                return hit
+    except (RedisError, OSError) as e:
+        logger.debug(f"Redis unavailable for LLM cache: {e}")
+
+    if db is not None:
+        cached = await get_cached(db, cache_key)
+        if cached is not None:
+            hit = _validate(cached)
+            if hit is not None:
+                return hit
+
+    response = await coro_factory()
+
+    try:
+        await _get_redis().set(cache_key, json.dumps(response), ex=settings.CACHE_TTL_SECONDS)
+    except (RedisError, OSError) as e:
+        logger.debug(f"Redis unavailable for LLM cache: {e}")
+
+    if db is not None:
+        await set_cached(db, cache_key, response, source="llm")
+
+    return response
+
+
+async def close_redis():
+    """Close the shared Redis connection pool"""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
@@ -1,14 +1,166 @@
 import httpx
-import json
-from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
+import orjson
+import re
+from string import Formatter
+from types import MappingProxyType
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.core.config import get_settings
+from app.core.config import settings
 from app.core.exceptions import LLMProcessingError
-from app.models.database import CachedData
+from app.services.data_cache import get_cached, get_cached_many, set_cached, set_cached_many
 
-settings = get_settings()
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared HTTP/2 client: keeps the TLS connection to the LLM API alive between calls"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=60.0,
+            limits=httpx.Limits(max_keepalive_connections=20)
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared client (application shutdown, end of a Celery task)"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def _compile_template(template: str) -> Callable[..., str]:
+    """
+    Split a str.format template into literal chunks and field names once.
+    The returned renderer only joins strings, without re-parsing the template.
+    """
+    # Escaped braces come back as separate chunks: merge them into one prefix per field
+    fields = []
+    literals = [""]
+    for literal, field, format_spec, conversion in Formatter().parse(template):
+        assert not format_spec and not conversion, "only plain {field} placeholders are supported"
+        literals[-1] += literal
+        if field is not None:
+            fields.append(field)
+            literals.append("")
+    suffix = literals.pop()
+    parts = list(zip(literals, fields))
+
+    def render(**values: Any) -> str:
+        return "".join([f"{literal}{values[field]}" for literal, field in parts]) + suffix
+
+    return render
+
+
+_DECISION_TYPE_RE = re.compile(r'decision type:\s*(\w+)')
+
+
+def _mock_report(prompt_lower: str) -> Dict[str, Any]:
+    return {
+        "summary": "Based on the analysis, both options present viable paths with distinct trade-offs.",
+        "risks": [
+            "Market volatility may affect projections",
+            "Regulations may change",
+            "External factors may vary over time"
+        ],
+        "recommendation": "Consider the option with better long-term financial outlook while weighing personal preferences.",
+        "confidence_score": 0.75
+    }
+
+
+def _mock_relocation(prompt_lower: str) -> Dict[str, Any]:
+    return {
+        "cities": ["Berlin", "Amsterdam"],
+        "factors_to_compare": ["cost_of_living", "salary", "taxes", "quality_of_life"],
+        "user_context": {
+            "current_location": "Unknown",
+            "profession": "Tech professional",
+            "priorities": ["career growth", "quality of life"]
+        }
+    }
+
+
+def _mock_investment(prompt_lower: str) -> Dict[str, Any]:
+    # Проверяем содержание запроса для более точного ответа
+    if "stocks" in prompt_lower or "bonds" in prompt_lower:
+        options = ["stocks", "bonds"]
+    elif "real estate" in prompt_lower or "property" in prompt_lower:
+        options = ["real estate investment", "stock market"]
+    elif "crypto" in prompt_lower or "bitcoin" in prompt_lower:
+        options = ["cryptocurrency", "traditional investments"]
+    else:
+        options = ["Option A", "Option B"]
+
+    return {
+        "options": options,
+        "amount": 10000,
+        "risk_tolerance": "medium",
+        "factors_to_compare": ["returns", "volatility", "liquidity", "time_horizon"],
+        "user_context": {
+            "investment_experience": "beginner" if "beginner" in prompt_lower else "intermediate",
+            "age": 35,
+            "financial_goals": ["retirement", "wealth accumulation"]
+        }
+    }
+
+
+def _mock_purchase(prompt_lower: str) -> Dict[str, Any]:
+    if "car" in prompt_lower or "vehicle" in prompt_lower:
+        options = ["Electric Car", "Gasoline Car"]
+    elif "house" in prompt_lower or "apartment" in prompt_lower:
+        options = ["House in suburbs", "Apartment in city center"]
+    else:
+        options = ["Option X", "Option Y"]
+
+    return {
+        "options": options,
+        "budget": 50000,
+        "factors_to_compare": ["price", "maintenance", "depreciation", "utility"],
+        "user_context": {
+            "current_situation": "Looking to upgrade",
+            "needs": ["reliability", "cost-effectiveness"],
+            "preferences": ["modern design", "efficiency"]
+        }
+    }
+
+
+def _mock_job(prompt_lower: str) -> Dict[str, Any]:
+    return {
+        "options": ["Software Engineer at Company A", "Data Scientist at Company B"],
+        "factors_to_compare": ["salary", "growth", "work_life_balance", "benefits"],
+        "user_context": {
+            "current_job": "Developer",
+            "experience": "5 years",
+            "career_goals": ["leadership", "technical expertise"]
+        }
+    }
+
+
+def _mock_default(prompt_lower: str) -> Dict[str, Any]:
+    # По умолчанию для инвестиций
+    return {
+        "options": ["stocks", "bonds"],
+        "amount": 10000,
+        "risk_tolerance": "medium",
+        "factors_to_compare": ["returns", "volatility", "liquidity"],
+        "user_context": {
+            "investment_experience": "intermediate",
+            "age": 35,
+            "financial_goals": ["growth", "security"]
+        }
+    }
+
+
+_MOCK_BUILDERS = {
+    "report": _mock_report,
+    "relocation": _mock_relocation,
+    "investment": _mock_investment,
+    "purchase": _mock_purchase,
+    "job": _mock_job,
+}
 
 
 class LLMService:
@@ -90,21 +242,25 @@ Return as JSON:
     "confidence_score": 0.85
 }}"""
 
+    _render_structuring = staticmethod(_compile_template(STRUCTURING_PROMPT))
+    _render_report = staticmethod(_compile_template(REPORT_PROMPT))
+
     def __init__(self):
         self.api_key = settings.OPENAI_API_KEY
         self.model = settings.LLM_MODEL
+        self.provider = "openai" if self.api_key else "mock"
 
     async def structure_query(self, query: str, decision_type: str) -> Dict[str, Any]:
         """Parse user query into structured factors using LLM"""
-        prompt = self.STRUCTURING_PROMPT.format(
+        prompt = self._render_structuring(
             query=query,
             decision_type=decision_type
         )
 
         response = await self._call_llm(prompt, decision_type)
         try:
-            return json.loads(response)
-        except json.JSONDecodeError as e:
+            return orjson.loads(response)
+        except orjson.JSONDecodeError as e:
             raise LLMProcessingError(
                 message="Failed to parse LLM response",
                 detail=str(e)
@@ -112,16 +268,16 @@ Return as JSON:
 
     async def generate_report(self, query: str, results: Dict[str, Any], decision_type: str = None) -> Dict[str, Any]:
         """Generate AI report from simulation results"""
-        prompt = self.REPORT_PROMPT.format(
+        prompt = self._render_report(
             query=query,
             decision_type=decision_type or "general",
-            results=json.dumps(results, indent=2)
+            results=orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY).decode()
         )
 
         response = await self._call_llm(prompt, "report")
         try:
-            return json.loads(response)
-        except json.JSONDecodeError as e:
+            return orjson.loads(response)
+        except orjson.JSONDecodeError as e:
             raise LLMProcessingError(
                 message="Failed to parse report",
                 detail=str(e)
@@ -133,133 +289,126 @@ Return as JSON:
             # Mock response for development
             return self._mock_response(prompt, context)
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    "https://api.openai.com/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "messages": [{"role": "user", "content": prompt}],
-                        "temperature": 0.7
-                    },
-                    timeout=60.0
-                )
+        try:
+            # Streamed (SSE) so the answer is decoded while it is still arriving
+            async with get_http_client().stream(
+                "POST",
+                "https://api.openai.com/v1/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": self.model,
+                    "messages": [{"role": "user", "content": prompt}],
+                    "temperature": 0.7,
+                    "stream": True
+                }
+            ) as response:
                 response.raise_for_status()
-                data = response.json()
-                return data["choices"][0]["message"]["content"]
-            except httpx.HTTPError as e:
-                raise LLMProcessingError(
-                    message="LLM API call failed",
-                    detail=str(e)
-                )
+                parts = []
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[len("data:"):].strip()
+                    if payload == "[DONE]":
+                        break
+                    delta = orjson.loads(payload)["choices"][0].get("delta", {})
+                    parts.append(delta.get("content") or "")
+                return "".join(parts)
+        except httpx.HTTPError as e:
+            raise LLMProcessingError(
+                message="LLM API call failed",
+                detail=str(e)
+            )
 
     def _mock_response(self, prompt: str, context: str = None) -> str:
         """Mock response for development without API key"""
         prompt_lower = prompt.lower()
 
-        # Определяем тип решения
+        # Определяем тип решения: из контекста или из строки "Decision Type:" промпта
         if context:
-            # Используем предоставленный контекст
             decision_type = context.lower()
-        elif "decision type:" in prompt_lower:
-            # Извлекаем тип решения из промпта
-            import re
-            match = re.search(r'decision type:\s*(\w+)', prompt_lower)
-            decision_type = match.group(1) if match else None
-        else:
-            decision_type = None
-
-        # Для отчетов
-        if "summary" in prompt_lower or "report" in prompt_lower:
-            return json.dumps({
-                "summary": "Based on the analysis, both options present viable paths with distinct trade-offs.",
-                "risks": [
-                    "Market volatility may affect projections",
-                    "Regulations may change",
-                    "External factors may vary over time"
-                ],
-                "recommendation": "Consider the option with better long-term financial outlook while weighing personal preferences.",
-                "confidence_score": 0.75
-            })
-
-        # Для структурирования по типам решений
-        if decision_type == "relocation" or ("relocation" in prompt_lower and "example" not in prompt_lower):
-            return json.dumps({
-                "cities": ["Berlin", "Amsterdam"],
-                "factors_to_compare": ["cost_of_living", "salary", "taxes", "quality_of_life"],
-                "user_context": {
-                    "current_location": "Unknown",
-                    "profession": "Tech professional",
-                    "priorities": ["career growth", "quality of life"]
-                }
-            })
-        elif decision_type == "investment" or ("investment" in prompt_lower and "example" not in prompt_lower):
-            # Проверяем содержание запроса для более точного ответа
-            if "stocks" in prompt_lower or "bonds" in prompt_lower:
-                options = ["stocks", "bonds"]
-            elif "real estate" in prompt_lower or "property" in prompt_lower:
-                options = ["real estate investment", "stock market"]
-            elif "crypto" in prompt_lower or "bitcoin" in prompt_lower:
-                options = ["cryptocurrency", "traditional investments"]
-            else:
-                options = ["Option A", "Option B"]
-
-            return json.dumps({
-                "options": options,
-                "amount": 10000,
-                "risk_tolerance": "medium",
-                "factors_to_compare": ["returns", "volatility", "liquidity", "time_horizon"],
-                "user_context": {
-                    "investment_experience": "beginner" if "beginner" in prompt_lower else "intermediate",
-                    "age": 35,
-                    "financial_goals": ["retirement", "wealth accumulation"]
-                }
-            })
-        elif decision_type == "purchase" or ("purchase" in prompt_lower and "example" not in prompt_lower):
-            if "car" in prompt_lower or "vehicle" in prompt_lower:
-                options = ["Electric Car", "Gasoline Car"]
-            elif "house" in prompt_lower or "apartment" in prompt_lower:
-                options = ["House in suburbs", "Apartment in city center"]
-            else:
-                options = ["Option X", "Option Y"]
-
-            return json.dumps({
-                "options": options,
-                "budget": 50000,
-                "factors_to_compare": ["price", "maintenance", "depreciation", "utility"],
-                "user_context": {
-                    "current_situation": "Looking to upgrade",
-                    "needs": ["reliability", "cost-effectiveness"],
-                    "preferences": ["modern design", "efficiency"]
-                }
-            })
-        elif decision_type == "job" or ("job" in prompt_lower and "example" not in prompt_lower):
-            return json.dumps({
-                "options": ["Software Engineer at Company A", "Data Scientist at Company B"],
-                "factors_to_compare": ["salary", "growth", "work_life_balance", "benefits"],
-                "user_context": {
-                    "current_job": "Developer",
-                    "experience": "5 years",
-                    "career_goals": ["leadership", "technical expertise"]
-                }
-            })
         else:
-            # По умолчанию для инвестиций
-            return json.dumps({
-                "options": ["stocks", "bonds"],
-                "amount": 10000,
-                "risk_tolerance": "medium",
-                "factors_to_compare": ["returns", "volatility", "liquidity"],
-                "user_context": {
-                    "investment_experience": "intermediate",
-                    "age": 35,
-                    "financial_goals": ["growth", "security"]
-                }
-            })
+            match = _DECISION_TYPE_RE.search(prompt_lower)
+            decision_type = match.group(1) if match else None
+
+        # Для отчетов и структурирования по типам решений — одна выборка из словаря
+        builder = _MOCK_BUILDERS.get(decision_type, _mock_default)
+        return orjson.dumps(builder(prompt_lower)).decode()
+
+
+# Mock-таблицы строятся один раз при импорте. Значения — обычные dict, так как
+# уходят в JSON-колонку cached_data; вызывающий код их не изменяет
+_COL_TABLE = MappingProxyType({
+    "berlin": {"rent": 1200, "food": 400, "transport": 86, "utilities": 200, "entertainment": 150},
+    "amsterdam": {"rent": 1800, "food": 450, "transport": 100, "utilities": 180, "entertainment": 200},
+    "london": {"rent": 2200, "food": 500, "transport": 150, "utilities": 200, "entertainment": 250},
+    "paris": {"rent": 1600, "food": 480, "transport": 75, "utilities": 170, "entertainment": 180},
+})
+_DEFAULT_COL = {"rent": 1000, "food": 350, "transport": 80, "utilities": 150, "entertainment": 100}
+
+_TAX_TABLE = MappingProxyType({
+    "berlin": {"income_tax": 0.42, "social_security": 0.20, "effective_rate": 0.35},
+    "amsterdam": {"income_tax": 0.495, "social_security": 0.15, "effective_rate": 0.38},
+    "london": {"income_tax": 0.45, "social_security": 0.12, "effective_rate": 0.32},
+    "paris": {"income_tax": 0.45, "social_security": 0.22, "effective_rate": 0.40},
+})
+_DEFAULT_TAX = {"income_tax": 0.30, "social_security": 0.15, "effective_rate": 0.30}
+
+_FIN_TABLE = MappingProxyType({
+    "stocks": {
+        "historical_returns": 0.10,
+        "volatility": 0.20,
+        "sharpe_ratio": 0.50,
+        "max_drawdown": -0.33,
+        "correlation": {
+            "bonds": -0.20,
+            "real_estate": 0.60,
+            "gold": 0.15
+        }
+    },
+    "bonds": {
+        "historical_returns": 0.05,
+        "volatility": 0.05,
+        "sharpe_ratio": 1.00,
+        "max_drawdown": -0.08,
+        "correlation": {
+            "stocks": -0.20,
+            "real_estate": 0.10,
+            "gold": 0.05
+        }
+    },
+    "real estate": {
+        "historical_returns": 0.07,
+        "volatility": 0.10,
+        "sharpe_ratio": 0.70,
+        "max_drawdown": -0.20,
+        "correlation": {
+            "stocks": 0.60,
+            "bonds": 0.10,
+            "gold": 0.20
+        }
+    },
+    "crypto": {
+        "historical_returns": 0.15,
+        "volatility": 0.50,
+        "sharpe_ratio": 0.30,
+        "max_drawdown": -0.75,
+        "correlation": {
+            "stocks": 0.25,
+            "bonds": -0.10,
+            "gold": 0.10
+        }
+    }
+})
+_DEFAULT_FIN = {
+    "historical_returns": 0.06,
+    "volatility": 0.12,
+    "sharpe_ratio": 0.50,
+    "max_drawdown": -0.15,
+    "correlation": {}
+}
 
 
 class DataService:
@@ -270,7 +419,8 @@ class DataService:
 
     async def get_cost_of_living(self, city: str) -> Dict[str, float]:
         """Fetch cost of living data for a city"""
-        cache_key = f"col_{city.lower()}"
+        name = city.lower()
+        cache_key = f"col_{name}"
 
         # Check cache
         cached = await self._get_cached(cache_key)
@@ -278,7 +428,7 @@ class DataService:
             return cached
 
         # Mock data (replace with actual API call)
-        data = self._mock_cost_of_living(city)
+        data = self._mock_cost_of_living(name)
 
         # Cache the data
         await self._set_cached(cache_key, data, source="numbeo")
@@ -287,129 +437,90 @@ class DataService:
 
     async def get_tax_rates(self, city: str) -> Dict[str, float]:
         """Fetch tax rates for a city/country"""
-        cache_key = f"tax_{city.lower()}"
+        name = city.lower()
+        cache_key = f"tax_{name}"
 
         cached = await self._get_cached(cache_key)
         if cached:
             return cached
 
         # Mock data
-        data = self._mock_tax_rates(city)
+        data = self._mock_tax_rates(name)
         await self._set_cached(cache_key, data, source="internal")
 
         return data
 
+    async def get_city_data(
+        self,
+        cities: List[str]
+    ) -> Tuple[Dict[str, Dict[str, float]], Dict[str, Dict[str, float]]]:
+        """
+        Fetch cost of living and tax rates for several cities.
+        All cache lookups go out as one query; results are keyed by lowercased city.
+        """
+        names = list(dict.fromkeys(city.lower() for city in cities))
+        cached = await self._get_cached_many(
+            [f"col_{name}" for name in names] + [f"tax_{name}" for name in names]
+        )
+
+        cost_of_living = {}
+        tax_rates = {}
+        col_misses = []
+        tax_misses = []
+        for name in names:
+            col = cached.get(f"col_{name}")
+            if col is None:
+                col = self._mock_cost_of_living(name)
+                col_misses.append((f"col_{name}", col))
+            cost_of_living[name] = col
+
+            tax = cached.get(f"tax_{name}")
+            if tax is None:
+                tax = self._mock_tax_rates(name)
+                tax_misses.append((f"tax_{name}", tax))
+            tax_rates[name] = tax
+
+        # Misses are written in bulk and committed by the caller
+        await set_cached_many(self.db, col_misses, source="numbeo")
+        await set_cached_many(self.db, tax_misses, source="internal")
+
+        return cost_of_living, tax_rates
+
     async def get_financial_data(self, investment_type: str) -> Dict[str, Any]:
         """Fetch financial data for investments"""
-        cache_key = f"fin_{investment_type.lower()}"
+        name = investment_type.lower()
+        cache_key = f"fin_{name}"
 
         cached = await self._get_cached(cache_key)
         if cached:
             return cached
 
         # Mock financial data
-        data = self._mock_financial_data(investment_type)
+        data = self._mock_financial_data(name)
         await self._set_cached(cache_key, data, source="financial_api")
 
         return data
 
     async def _get_cached(self, cache_key: str) -> Optional[Dict[str, Any]]:
         """Get data from cache"""
-        result = await self.db.execute(
-            select(CachedData).where(
-                CachedData.cache_key == cache_key,
-                CachedData.expires_at > datetime.utcnow()
-            )
-        )
-        cached = result.scalar_one_or_none()
-        return cached.data if cached else None
+        return await get_cached(self.db, cache_key)
+
+    async def _get_cached_many(self, cache_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get several cache entries with a single query"""
+        return await get_cached_many(self.db, cache_keys)
 
     async def _set_cached(self, cache_key: str, data: Dict[str, Any], source: str):
-        """Set data in cache"""
-        expires_at = datetime.utcnow() + timedelta(seconds=settings.CACHE_TTL_SECONDS)
-
-        cached = CachedData(
-            cache_key=cache_key,
-            data=data,
-            source=source,
-            expires_at=expires_at
-        )
-        self.db.add(cached)
-        await self.db.commit()
-
-    def _mock_cost_of_living(self, city: str) -> Dict[str, float]:
-        """Mock cost of living data"""
-        data = {
-            "berlin": {"rent": 1200, "food": 400, "transport": 86, "utilities": 200, "entertainment": 150},
-            "amsterdam": {"rent": 1800, "food": 450, "transport": 100, "utilities": 180, "entertainment": 200},
-            "london": {"rent": 2200, "food": 500, "transport": 150, "utilities": 200, "entertainment": 250},
-            "paris": {"rent": 1600, "food": 480, "transport": 75, "utilities": 170, "entertainment": 180},
-        }
-        return data.get(city.lower(),
-                        {"rent": 1000, "food": 350, "transport": 80, "utilities": 150, "entertainment": 100})
-
-    def _mock_tax_rates(self, city: str) -> Dict[str, float]:
-        """Mock tax rates"""
-        data = {
-            "berlin": {"income_tax": 0.42, "social_security": 0.20, "effective_rate": 0.35},
-            "amsterdam": {"income_tax": 0.495, "social_security": 0.15, "effective_rate": 0.38},
-            "london": {"income_tax": 0.45, "social_security": 0.12, "effective_rate": 0.32},
-            "paris": {"income_tax": 0.45, "social_security": 0.22, "effective_rate": 0.40},
-        }
-        return data.get(city.lower(), {"income_tax": 0.30, "social_security": 0.15, "effective_rate": 0.30})
-
-    def _mock_financial_data(self, investment_type: str) -> Dict[str, Any]:
-        """Mock financial data for investments"""
-        data = {
-            "stocks": {
-                "historical_returns": 0.10,
-                "volatility": 0.20,
-                "sharpe_ratio": 0.50,
-                "max_drawdown": -0.33,
-                "correlation": {
-                    "bonds": -0.20,
-                    "real_estate": 0.60,
-                    "gold": 0.15
-                }
-            },
-            "bonds": {
-                "historical_returns": 0.05,
-                "volatility": 0.05,
-                "sharpe_ratio": 1.00,
-                "max_drawdown": -0.08,
-                "correlation": {
-                    "stocks": -0.20,
-                    "real_estate": 0.10,
-                    "gold": 0.05
-                }
-            },
-            "real estate": {
-                "historical_returns": 0.07,
-                "volatility": 0.10,
-                "sharpe_ratio": 0.70,
-                "max_drawdown": -0.20,
-                "correlation": {
-                    "stocks": 0.60,
-                    "bonds": 0.10,
-                    "gold": 0.20
-                }
-            },
-            "crypto": {
-                "historical_returns": 0.15,
-                "volatility": 0.50,
-                "sharpe_ratio": 0.30,
-                "max_drawdown": -0.75,
-                "correlation": {
-                    "stocks": 0.25,
-                    "bonds": -0.10,
-                    "gold": 0.10
-                }
-            }
-        }
-        return data.get(investment_type.lower(), {
-            "historical_returns": 0.06,
-            "volatility": 0.12,
-            "sharpe_ratio": 0.50,
-            "max_drawdown": -0.15,
-            "correlation": {}
-        })
\ No newline at end of file
+        """Set data in cache (persisted with the caller's commit)"""
+        await set_cached(self.db, cache_key, data, source)
+
+    def _mock_cost_of_living(self, name: str) -> Dict[str, float]:
+        """Mock cost of living data (name is already lowercased by the caller)"""
+        return _COL_TABLE.get(name, _DEFAULT_COL)
+
+    def _mock_tax_rates(self, name: str) -> Dict[str, float]:
+        """Mock tax rates (name is already lowercased by the caller)"""
+        return _TAX_TABLE.get(name, _DEFAULT_TAX)
+
+    def _mock_financial_data(self, name: str) -> Dict[str, Any]:
+        """Mock financial data for investments (name is already lowercased by the caller)"""
+        return _FIN_TABLE.get(name, _DEFAULT_FIN)
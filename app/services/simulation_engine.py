@@ -1,8 +1,167 @@
+import multiprocessing
+import os
 import numpy as np
-from typing import Dict, List, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Sequence, Tuple
 from datetime import datetime
+from app.core.config import settings
 from app.schemas.schemas import DecisionType
 
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _pool_workers() -> int:
+    """Pool size for this process: its share of the CPUs across WEB_CONCURRENCY workers"""
+    if settings.SIMULATION_POOL_WORKERS > 0:
+        return settings.SIMULATION_POOL_WORKERS
+    return max(1, (os.cpu_count() or 1) // max(1, settings.WEB_CONCURRENCY))
+
+
+def _init_worker():
+    """Pool initializer: numpy and this module are imported, run one tiny kernel call"""
+    _mc_compound(np.ones((2, 8), dtype=np.float32), 1.0, 0.0, 0.0)
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Shared pool for CPU-bound Monte Carlo work, created lazily per process"""
+    global _process_pool
+    if _process_pool is None:
+        # spawn: forking a process that runs an event loop and DB sockets is unsafe
+        _process_pool = ProcessPoolExecutor(
+            max_workers=_pool_workers(),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker
+        )
+    return _process_pool
+
+
+def warm_process_pool():
+    """Spawn every pool worker up front; blocking, so call it off the event loop"""
+    pool = get_process_pool()
+    # Back-to-back submits with no idle worker spawn one process each
+    for future in [pool.submit(_worker_ready) for _ in range(_pool_workers())]:
+        future.result()
+
+
+def shutdown_process_pool():
+    """Stop the shared pool (called on application shutdown)"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=True, cancel_futures=True)
+        _process_pool = None
+
+
+def run_simulation_in_process(
+    decision_type: DecisionType,
+    structured_data: Dict[str, Any],
+    external_data: Dict[str, Any],
+    time_horizon_years: int,
+    monte_carlo_runs: int,
+    seed: Optional[int] = None
+) -> Dict[str, Any]:
+    """Picklable entry point for the process pool; only plain data crosses processes"""
+    engine = SimulationEngine(
+        time_horizon_years=time_horizon_years,
+        monte_carlo_runs=monte_carlo_runs,
+        seed=seed
+    )
+    return engine.run_simulation(decision_type, structured_data, external_data)
+
+
+# Monte Carlo method of each kind of per-option job
+_MC_METHODS = {
+    "savings": "_run_monte_carlo_savings",
+    "salary": "_run_monte_carlo_salary",
+    "investment": "_run_monte_carlo_investment",
+}
+
+# Leading axes of the standard normal block one option consumes (savings: salary + inflation)
+_MC_STREAMS = {
+    "savings": (2,),
+    "salary": (),
+    "investment": (),
+}
+
+
+def _mc_compound(
+    z: np.ndarray,
+    initial: float,
+    mu: float,
+    sigma: float,
+    paths: bool = False
+) -> np.ndarray:
+    """initial * prod(1 + mu + sigma * z) over z (horizon, runs), overwriting z; final values or yearly paths"""
+    assert z.flags.c_contiguous, "Monte Carlo draws must be C-contiguous (horizon, runs)"
+    z *= sigma
+    z += 1.0 + mu
+    if paths:
+        np.cumprod(z, axis=0, out=z)
+        z *= initial
+        return z
+    final = z[0].astype(np.float64)
+    for step in z[1:]:
+        final *= step
+    final *= initial
+    return final
+
+
+def _mc_summary(final: np.ndarray, percentiles: Sequence[int]) -> Dict[str, float]:
+    """Unrounded mean, std and percentiles of final, which is sorted in place"""
+    summary = {
+        "mean": float(final.mean()),
+        "std": float(final.std()),
+    }
+    final.sort()
+    idx = np.asarray(percentiles) * (final.size - 1) // 100
+    summary.update(zip((f"p{p}" for p in percentiles), final[idx].tolist()))
+    return summary
+
+
+# Yearly projection tables: one structured array per option, kept unrounded
+# inside the engine and converted to list-of-dicts once by _yearly_records
+_RELOCATION_YEAR = np.dtype([
+    ("year", "i8"), ("gross_income", "f8"), ("net_income", "f8"),
+    ("total_expenses", "f8"), ("savings", "f8"), ("cumulative_savings", "f8"),
+])
+_PURCHASE_YEAR = np.dtype([
+    ("year", "i8"), ("current_value", "f8"), ("maintenance_cost", "f8"),
+    ("total_cost_to_date", "f8"), ("net_value", "f8"),
+])
+_JOB_YEAR = np.dtype([
+    ("year", "i8"), ("salary", "f8"), ("cumulative_earnings", "f8"), ("growth_rate", "f8"),
+])
+_INVESTMENT_YEAR = np.dtype([
+    ("year", "i8"), ("value", "f8"), ("total_return", "f8"), ("return_percentage", "f8"),
+])
+
+
+def _yearly_records(table: np.ndarray) -> List[Dict[str, Any]]:
+    """Structured yearly table -> JSON-ready list of dicts, values rounded to cents (in place)"""
+    names = table.dtype.names
+    # One np.round pass per column instead of a Python round() per cell
+    for name in names:
+        column = table[name]
+        if column.dtype.kind == "f":
+            np.round(column, 2, out=column)
+    return [dict(zip(names, row)) for row in table.tolist()]
+
+
+def _format_results(results: Dict[str, Any]) -> Dict[str, Any]:
+    """Yearly tables to lists of dicts and Monte Carlo values rounded to cents, once at the output"""
+    results["projections"] = {
+        name: _yearly_records(table) for name, table in results["projections"].items()
+    }
+    if results["monte_carlo"]:
+        results["monte_carlo"] = {
+            name: {key: round(value, 2) for key, value in summary.items()}
+            for name, summary in results["monte_carlo"].items()
+        }
+    return results
+
 
 class SimulationEngine:
     """Engine for running financial simulations"""
@@ -10,81 +169,87 @@ class SimulationEngine:
     def __init__(
         self,
         time_horizon_years: int = 5,
-        monte_carlo_runs: int = 1000
+        monte_carlo_runs: int = 1000,
+        seed: Optional[int] = None
     ):
         self.time_horizon = time_horizon_years
         self.monte_carlo_runs = monte_carlo_runs
+        # PCG64 generator; pass a seed for reproducible runs
+        self._rng = np.random.default_rng(seed)
+        # Compounding factors over the fixed horizon, shared by every option and call
+        self._years = np.arange(1, time_horizon_years + 1)
+        self._salary_growth = 1.02 ** self._years  # 2% salary growth
+        self._inflation = 1.03 ** self._years  # 3% inflation
+        self._factors: Dict[float, np.ndarray] = {}
+        # decision type -> simulator; DecisionType is a str enum, so raw DB values match too
+        self._dispatch = {
+            DecisionType.RELOCATION: self._simulate_relocation,
+            DecisionType.PURCHASE: self._simulate_purchase,
+            DecisionType.JOB: self._simulate_job,
+            DecisionType.INVESTMENT: self._simulate_investment,
+        }
+    
+    def _growth_factors(self, rate: float) -> np.ndarray:
+        """(1 + rate) ** year for every year of the horizon, cached per rate; do not modify"""
+        factors = self._factors.get(rate)
+        if factors is None:
+            factors = self._factors[rate] = (1 + rate) ** self._years
+        return factors
     
-    async def run_simulation(
+    def run_simulation(
         self,
         decision_type: DecisionType,
         structured_data: Dict[str, Any],
         external_data: Dict[str, Any]
     ) -> Dict[str, Any]:
-        """Run simulation based on decision type"""
-        
-        if decision_type == DecisionType.RELOCATION:
-            return await self._simulate_relocation(structured_data, external_data)
-        elif decision_type == DecisionType.PURCHASE:
-            return await self._simulate_purchase(structured_data, external_data)
-        elif decision_type == DecisionType.JOB:
-            return await self._simulate_job(structured_data, external_data)
-        elif decision_type == DecisionType.INVESTMENT:
-            return await self._simulate_investment(structured_data, external_data)
-        else:
+        """Run simulation based on decision type (CPU-bound: keep it off the event loop)"""
+        handler = self._dispatch.get(decision_type)
+        if handler is None:
             raise ValueError(f"Unknown decision type: {decision_type}")
+        return _format_results(handler(structured_data, external_data))
     
-    async def _simulate_relocation(
+    def _simulate_relocation(
         self,
         structured_data: Dict[str, Any],
         external_data: Dict[str, Any]
     ) -> Dict[str, Any]:
         """Simulate relocation decision"""
+        simulation_date = datetime.utcnow().isoformat()
         cities = structured_data.get("cities", [])
         projections = {}
-        monte_carlo_results = {}
+        mc_jobs = []
+        
+        # Loop-invariant lookups
+        cost_of_living = external_data.get("cost_of_living", {})
+        tax_rates = external_data.get("tax_rates", {})
+        # Base salary assumption (can be customized)
+        base_salary = structured_data.get("user_context", {}).get("salary", 80000)
         
         for city in cities:
             city_lower = city.lower()
-            col = external_data.get("cost_of_living", {}).get(city_lower, {})
-            tax = external_data.get("tax_rates", {}).get(city_lower, {})
+            col = cost_of_living.get(city_lower, {})
+            tax = tax_rates.get(city_lower, {})
             
             # Calculate yearly costs
             monthly_cost = sum(col.values()) if col else 2000
             yearly_cost = monthly_cost * 12
             effective_tax = tax.get("effective_rate", 0.30)
             
-            # Base salary assumption (can be customized)
-            base_salary = structured_data.get("user_context", {}).get("salary", 80000)
+            # Generate yearly projections (assume 3% inflation, 2% salary growth)
+            table = np.empty(self.time_horizon, dtype=_RELOCATION_YEAR)
+            table["year"] = self._years
+            np.multiply(base_salary, self._salary_growth, out=table["gross_income"])
+            np.multiply(yearly_cost, self._inflation, out=table["total_expenses"])
+            np.multiply(table["gross_income"], 1 - effective_tax, out=table["net_income"])
+            np.subtract(table["net_income"], table["total_expenses"], out=table["savings"])
+            np.cumsum(table["savings"], out=table["cumulative_savings"])
             
-            # Generate yearly projections
-            yearly_projections = []
-            for year in range(1, self.time_horizon + 1):
-                # Assume 3% inflation, 2% salary growth
-                inflation_factor = 1.03 ** year
-                salary_factor = 1.02 ** year
-                
-                adjusted_salary = base_salary * salary_factor
-                adjusted_cost = yearly_cost * inflation_factor
-                net_income = adjusted_salary * (1 - effective_tax)
-                savings = net_income - adjusted_cost
-                
-                yearly_projections.append({
-                    "year": year,
-                    "gross_income": round(adjusted_salary, 2),
-                    "net_income": round(net_income, 2),
-                    "total_expenses": round(adjusted_cost, 2),
-                    "savings": round(savings, 2),
-                    "cumulative_savings": round(savings * year, 2)  # Simplified
-                })
-            
-            projections[city] = yearly_projections
+            projections[city] = table
             
             # Monte Carlo simulation
-            mc_results = self._run_monte_carlo_savings(
-                base_salary, yearly_cost, effective_tax
-            )
-            monte_carlo_results[city] = mc_results
+            mc_jobs.append((base_salary, yearly_cost, effective_tax))
+        
+        monte_carlo_results = dict(zip(cities, self._run_monte_carlo_many("savings", mc_jobs)))
         
         return {
             "projections": projections,
@@ -92,16 +257,17 @@ class SimulationEngine:
             "metadata": {
                 "time_horizon_years": self.time_horizon,
                 "monte_carlo_runs": self.monte_carlo_runs,
-                "simulation_date": datetime.utcnow().isoformat()
+                "simulation_date": simulation_date
             }
         }
     
-    async def _simulate_purchase(
+    def _simulate_purchase(
         self,
         structured_data: Dict[str, Any],
         external_data: Dict[str, Any]
     ) -> Dict[str, Any]:
         """Simulate purchase decision"""
+        simulation_date = datetime.utcnow().isoformat()
         options = structured_data.get("options", [])
         budget = structured_data.get("budget", 50000)
         projections = {}
@@ -112,66 +278,52 @@ class SimulationEngine:
             yearly_maintenance = initial_cost * 0.05
             depreciation_rate = 0.15
             
-            yearly_projections = []
-            current_value = initial_cost
-            total_cost = initial_cost
-            
-            for year in range(1, self.time_horizon + 1):
-                current_value *= (1 - depreciation_rate)
-                total_cost += yearly_maintenance
-                
-                yearly_projections.append({
-                    "year": year,
-                    "current_value": round(current_value, 2),
-                    "maintenance_cost": round(yearly_maintenance, 2),
-                    "total_cost_to_date": round(total_cost, 2),
-                    "net_value": round(current_value - total_cost, 2)
-                })
+            table = np.empty(self.time_horizon, dtype=_PURCHASE_YEAR)
+            table["year"] = self._years
+            np.multiply(initial_cost, self._growth_factors(-depreciation_rate), out=table["current_value"])
+            table["maintenance_cost"] = yearly_maintenance
+            np.multiply(yearly_maintenance, self._years, out=table["total_cost_to_date"])
+            table["total_cost_to_date"] += initial_cost
+            np.subtract(table["current_value"], table["total_cost_to_date"], out=table["net_value"])
             
-            projections[option] = yearly_projections
+            projections[option] = table
         
         return {
             "projections": projections,
             "monte_carlo": None,
             "metadata": {
                 "time_horizon_years": self.time_horizon,
-                "simulation_date": datetime.utcnow().isoformat()
+                "simulation_date": simulation_date
             }
         }
     
-    async def _simulate_job(
+    def _simulate_job(
         self,
         structured_data: Dict[str, Any],
         external_data: Dict[str, Any]
     ) -> Dict[str, Any]:
         """Simulate job decision"""
+        simulation_date = datetime.utcnow().isoformat()
         options = structured_data.get("options", [])
         projections = {}
-        monte_carlo_results = {}
+        mc_jobs = []
         
         for i, option in enumerate(options):
             base_salary = 70000 + i * 15000  # Mock salaries
             growth_rate = 0.05 + i * 0.02
             
-            yearly_projections = []
-            cumulative_earnings = 0
+            table = np.empty(self.time_horizon, dtype=_JOB_YEAR)
+            table["year"] = self._years
+            np.multiply(base_salary, self._growth_factors(growth_rate), out=table["salary"])
+            np.cumsum(table["salary"], out=table["cumulative_earnings"])
+            table["growth_rate"] = growth_rate * 100
             
-            for year in range(1, self.time_horizon + 1):
-                current_salary = base_salary * ((1 + growth_rate) ** year)
-                cumulative_earnings += current_salary
-                
-                yearly_projections.append({
-                    "year": year,
-                    "salary": round(current_salary, 2),
-                    "cumulative_earnings": round(cumulative_earnings, 2),
-                    "growth_rate": round(growth_rate * 100, 1)
-                })
-            
-            projections[option] = yearly_projections
+            projections[option] = table
             
             # Monte Carlo for salary growth uncertainty
-            mc_results = self._run_monte_carlo_salary(base_salary, growth_rate)
-            monte_carlo_results[option] = mc_results
+            mc_jobs.append((base_salary, growth_rate))
+        
+        monte_carlo_results = dict(zip(options, self._run_monte_carlo_many("salary", mc_jobs)))
         
         return {
             "projections": projections,
@@ -179,20 +331,21 @@ class SimulationEngine:
             "metadata": {
                 "time_horizon_years": self.time_horizon,
                 "monte_carlo_runs": self.monte_carlo_runs,
-                "simulation_date": datetime.utcnow().isoformat()
+                "simulation_date": simulation_date
             }
         }
     
-    async def _simulate_investment(
+    def _simulate_investment(
         self,
         structured_data: Dict[str, Any],
         external_data: Dict[str, Any]
     ) -> Dict[str, Any]:
         """Simulate investment decision"""
+        simulation_date = datetime.utcnow().isoformat()
         options = structured_data.get("options", [])
         amount = structured_data.get("amount", 10000)
         projections = {}
-        monte_carlo_results = {}
+        mc_jobs = []
         
         # Mock investment parameters
         investment_params = {
@@ -213,25 +366,20 @@ class SimulationEngine:
             volatility = params["volatility"]
             
             # Deterministic projection
-            yearly_projections = []
-            current_value = amount
+            table = np.empty(self.time_horizon, dtype=_INVESTMENT_YEAR)
+            table["year"] = self._years
+            np.multiply(amount, self._growth_factors(expected_return), out=table["value"])
+            np.subtract(table["value"], amount, out=table["total_return"])
+            np.divide(table["value"], amount, out=table["return_percentage"])
+            table["return_percentage"] -= 1
+            table["return_percentage"] *= 100
             
-            for year in range(1, self.time_horizon + 1):
-                current_value *= (1 + expected_return)
-                yearly_projections.append({
-                    "year": year,
-                    "value": round(current_value, 2),
-                    "total_return": round(current_value - amount, 2),
-                    "return_percentage": round((current_value / amount - 1) * 100, 2)
-                })
-            
-            projections[option] = yearly_projections
+            projections[option] = table
             
             # Monte Carlo simulation
-            mc_results = self._run_monte_carlo_investment(
-                amount, expected_return, volatility
-            )
-            monte_carlo_results[option] = mc_results
+            mc_jobs.append((amount, expected_return, volatility))
+        
+        monte_carlo_results = dict(zip(options, self._run_monte_carlo_many("investment", mc_jobs)))
         
         return {
             "projections": projections,
@@ -240,92 +388,71 @@ class SimulationEngine:
                 "time_horizon_years": self.time_horizon,
                 "monte_carlo_runs": self.monte_carlo_runs,
                 "initial_amount": amount,
-                "simulation_date": datetime.utcnow().isoformat()
+                "simulation_date": simulation_date
             }
         }
     
+    def _run_monte_carlo_many(
+        self,
+        kind: str,
+        jobs: Sequence[Tuple[float, ...]]
+    ) -> List[Dict[str, float]]:
+        """Run one Monte Carlo per option on slices of one (options, ..., horizon, runs) normal block"""
+        method = getattr(self, _MC_METHODS[kind])
+        z = self._normals(len(jobs), *_MC_STREAMS[kind], self.time_horizon)
+        return [method(*args, z=z[i]) for i, args in enumerate(jobs)]
+    
+    def _normals(self, *leading: int) -> np.ndarray:
+        """float32 standard normals (*leading, runs) as antithetic pairs (z, -z) along the runs axis"""
+        half = self._rng.standard_normal((*leading, (self.monte_carlo_runs + 1) // 2), dtype=np.float32)
+        return np.concatenate(
+            (half, np.negative(half[..., :self.monte_carlo_runs // 2])), axis=-1
+        )
+    
     def _run_monte_carlo_savings(
         self,
         base_salary: float,
         yearly_cost: float,
-        tax_rate: float
+        tax_rate: float,
+        z: Optional[np.ndarray] = None
     ) -> Dict[str, float]:
-        """Run Monte Carlo simulation for savings projection"""
-        final_savings = []
-        
-        for _ in range(self.monte_carlo_runs):
-            cumulative_savings = 0
-            salary = base_salary
-            cost = yearly_cost
-            
-            for year in range(self.time_horizon):
-                # Random factors
-                salary_growth = np.random.normal(0.02, 0.02)
-                inflation = np.random.normal(0.03, 0.01)
-                
-                salary *= (1 + salary_growth)
-                cost *= (1 + inflation)
-                
-                net_income = salary * (1 - tax_rate)
-                cumulative_savings += net_income - cost
-            
-            final_savings.append(cumulative_savings)
-        
-        return {
-            "mean": round(np.mean(final_savings), 2),
-            "std": round(np.std(final_savings), 2),
-            "p5": round(np.percentile(final_savings, 5), 2),
-            "p25": round(np.percentile(final_savings, 25), 2),
-            "p50": round(np.percentile(final_savings, 50), 2),
-            "p75": round(np.percentile(final_savings, 75), 2),
-            "p95": round(np.percentile(final_savings, 95), 2)
-        }
+        """Run Monte Carlo simulation for savings projection; z (2, horizon, runs) is consumed if given"""
+        # Both random streams in one draw: [0] salary growth ~N(2%, 2%), [1] inflation ~N(3%, 1%)
+        if z is None:
+            z = self._normals(2, self.time_horizon)
+        net_income = _mc_compound(z[0], base_salary * (1 - tax_rate), 0.02, 0.02, paths=True)
+        net_income -= _mc_compound(z[1], yearly_cost, 0.03, 0.01, paths=True)
+        final_savings = net_income.sum(axis=0, dtype=np.float64)
+
+        return _mc_summary(final_savings, (5, 25, 50, 75, 95))
     
     def _run_monte_carlo_salary(
         self,
         base_salary: float,
-        expected_growth: float
+        expected_growth: float,
+        z: Optional[np.ndarray] = None
     ) -> Dict[str, float]:
-        """Run Monte Carlo for salary projections"""
-        final_salaries = []
-        
-        for _ in range(self.monte_carlo_runs):
-            salary = base_salary
-            for year in range(self.time_horizon):
-                growth = np.random.normal(expected_growth, 0.03)
-                salary *= (1 + growth)
-            final_salaries.append(salary)
-        
-        return {
-            "mean": round(np.mean(final_salaries), 2),
-            "std": round(np.std(final_salaries), 2),
-            "p5": round(np.percentile(final_salaries, 5), 2),
-            "p95": round(np.percentile(final_salaries, 95), 2)
-        }
+        """Run Monte Carlo for salary projections; z (horizon, runs) is consumed if given"""
+        if z is None:
+            z = self._normals(self.time_horizon)
+        final_salaries = _mc_compound(z, base_salary, expected_growth, 0.03)
+
+        return _mc_summary(final_salaries, (5, 95))
     
     def _run_monte_carlo_investment(
         self,
         initial_amount: float,
         expected_return: float,
-        volatility: float
+        volatility: float,
+        z: Optional[np.ndarray] = None
     ) -> Dict[str, float]:
-        """Run Monte Carlo for investment projections"""
-        final_values = []
-        
-        for _ in range(self.monte_carlo_runs):
-            value = initial_amount
-            for year in range(self.time_horizon):
-                annual_return = np.random.normal(expected_return, volatility)
-                value *= (1 + annual_return)
-            final_values.append(value)
-        
-        return {
-            "mean": round(np.mean(final_values), 2),
-            "std": round(np.std(final_values), 2),
-            "p5": round(np.percentile(final_values, 5), 2),
-            "p25": round(np.percentile(final_values, 25), 2),
-            "p50": round(np.percentile(final_values, 50), 2),
-            "p75": round(np.percentile(final_values, 75), 2),
-            "p95": round(np.percentile(final_values, 95), 2),
-            "prob_loss": round(np.mean(np.array(final_values) < initial_amount) * 100, 2)
-        }
+        """Run Monte Carlo for investment projections; z (horizon, runs) is consumed if given"""
+        if z is None:
+            z = self._normals(self.time_horizon)
+        final_values = _mc_compound(z, initial_amount, expected_return, volatility)
+
+        summary = _mc_summary(final_values, (5, 25, 50, 75, 95))
+        # final_values is sorted now: the share below the initial amount is one binary search
+        prob_loss = np.searchsorted(final_values, initial_amount) / final_values.size * 100
+        summary["prob_loss"] = float(prob_loss)
+        return summary
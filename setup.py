@@ -12,7 +12,7 @@ setup(
         "asyncpg>=0.29.0",
         "pydantic>=2.5.0",
         "pydantic-settings>=2.1.0",
-        "httpx>=0.26.0",
+        "httpx[http2]>=0.26.0",
         "numpy>=1.26.0",
         "celery>=5.3.0",
         "redis>=5.0.0",
@@ -23,6 +23,7 @@ setup(
         "yfinance>=0.2.28",
         "pandas>=2.0.0",
         "jinja2>=3.1.0",
+        "orjson>=3.9.0",
     ],
     extras_require={
         "dev": [
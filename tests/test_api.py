@@ -4,6 +4,7 @@
 import pytest
 import logging
 import httpx
+import json
 
 # Настраиваем логирование тестов
 logging.basicConfig(
@@ -66,6 +67,43 @@ class TestAPIEndpoints:
             assert response.status_code in [422, 500]
 
 
+    async def test_stream_scenarios(self):
+        """Тест потоковой выдачи сценариев в NDJSON"""
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://test"
+        ) as ac:
+            created = await ac.post(
+                "/api/v1/scenarios",
+                json={"name": "Stream test", "decision_type": "job"}
+            )
+            assert created.status_code == 200
+
+            response = await ac.get("/api/v1/scenarios/stream")
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("application/x-ndjson")
+            rows = [json.loads(line) for line in response.text.splitlines()]
+            assert created.json()["data"]["id"] in [row["id"] for row in rows]
+
+    async def test_scenario_count_and_fields(self):
+        """Тест подсчёта сценариев и выборки отдельных полей"""
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://test"
+        ) as ac:
+            response = await ac.get("/api/v1/scenarios/count")
+            assert response.status_code == 200
+            count = response.json()["data"]["count"]
+
+            response = await ac.get("/api/v1/scenarios", params={"fields": "id,name"})
+            assert response.status_code == 200
+            rows = response.json()["data"]
+            assert len(rows) == count
+            assert all(set(row) == {"id", "name"} for row in rows)
+
+            response = await ac.get("/api/v1/scenarios", params={"fields": "id,hashed_password"})
+            assert response.status_code == 400
+
     async def test_quick_simulation_basic(self):
         """Базовый тест симуляции без моков"""
         # Просто проверяем, что схема работает
@@ -0,0 +1,132 @@
+"""
+Тесты кэша ответов LLM (Redis + таблица cached_data)
+"""
+import json
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from redis.exceptions import RedisError
+from sqlalchemy import select, update
+
+from app.models.database import CachedData
+from app.services import llm_cache
+from tests.conftest import TestingSessionLocal
+
+
+class FakeRedis:
+    """Redis в памяти с тем же async get/set"""
+
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = value
+
+
+class DownRedis:
+    """Недоступный Redis"""
+
+    async def get(self, key):
+        raise RedisError("connection refused")
+
+    async def set(self, key, value, ex=None):
+        raise RedisError("connection refused")
+
+
+async def _stored(db, cache_key):
+    result = await db.execute(select(CachedData.data).where(CachedData.cache_key == cache_key))
+    return result.scalar_one_or_none()
+
+
+def _key_parts():
+    return ("test", "model", llm_cache.PROMPT_VERSION, "structure", uuid.uuid4().hex)
+
+
+def _factory(response, calls):
+    async def _call():
+        calls.append(1)
+        return response
+    return _call
+
+
+async def test_cached_call_redis_hit(monkeypatch):
+    """Попадание в Redis: LLM не вызывается"""
+    redis = FakeRedis()
+    monkeypatch.setattr(llm_cache, "_get_redis", lambda: redis)
+    key_parts = _key_parts()
+    redis.store[llm_cache.make_cache_key(key_parts)] = json.dumps({"answer": 1})
+
+    calls = []
+    assert await llm_cache.cached_call(key_parts, _factory({"answer": 2}, calls)) == {"answer": 1}
+    assert calls == []
+
+
+async def test_cached_call_miss_stores_in_redis_and_db(monkeypatch, db_session):
+    """Промах: ответ считается один раз и сохраняется в Redis и в таблицу"""
+    redis = FakeRedis()
+    monkeypatch.setattr(llm_cache, "_get_redis", lambda: redis)
+    key_parts = _key_parts()
+    cache_key = llm_cache.make_cache_key(key_parts)
+
+    calls = []
+    assert await llm_cache.cached_call(key_parts, _factory({"answer": 1}, calls), db_session) == {"answer": 1}
+    await db_session.commit()
+
+    assert calls == [1]
+    assert json.loads(redis.store[cache_key]) == {"answer": 1}
+    assert await _stored(db_session, cache_key) == {"answer": 1}
+
+
+async def test_cached_call_redis_down_uses_db(monkeypatch, db_session):
+    """Redis недоступен: запись из таблицы всё равно используется"""
+    monkeypatch.setattr(llm_cache, "_get_redis", lambda: DownRedis())
+    key_parts = _key_parts()
+
+    calls = []
+    await llm_cache.cached_call(key_parts, _factory({"answer": 1}, calls), db_session)
+    await db_session.commit()
+    assert await llm_cache.cached_call(key_parts, _factory({"answer": 2}, calls), db_session) == {"answer": 1}
+    assert calls == [1]
+
+
+async def test_cached_call_expired_entry_is_recomputed(monkeypatch, db_session):
+    """Просроченная запись в таблице пересчитывается и перезаписывается"""
+    monkeypatch.setattr(llm_cache, "_get_redis", lambda: DownRedis())
+    key_parts = _key_parts()
+    cache_key = llm_cache.make_cache_key(key_parts)
+
+    calls = []
+    await llm_cache.cached_call(key_parts, _factory({"answer": 1}, calls), db_session)
+    await db_session.execute(
+        update(CachedData)
+        .where(CachedData.cache_key == cache_key)
+        .values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+    )
+    await db_session.commit()
+
+    assert await llm_cache.cached_call(key_parts, _factory({"answer": 2}, calls), db_session) == {"answer": 2}
+    await db_session.commit()
+    assert calls == [1, 1]
+    assert await _stored(db_session, cache_key) == {"answer": 2}
+
+
+async def test_cached_call_concurrent_identical_misses(monkeypatch):
+    """Два одинаковых промаха одновременно: оба запроса коммитятся без IntegrityError"""
+    monkeypatch.setattr(llm_cache, "_get_redis", lambda: DownRedis())
+    key_parts = _key_parts()
+
+    async with TestingSessionLocal() as first, TestingSessionLocal() as second:
+        async def _slow_llm():
+            # Пока второй запрос ждёт LLM, первый успевает записать тот же ключ
+            await llm_cache.cached_call(key_parts, _factory({"answer": 1}, []), first)
+            await first.commit()
+            return {"answer": 2}
+
+        assert await llm_cache.cached_call(key_parts, _slow_llm, second) == {"answer": 2}
+        await second.commit()
+
+        assert await _stored(second, llm_cache.make_cache_key(key_parts)) == {"answer": 2}
@@ -0,0 +1,89 @@
+"""
+Тесты миграций: база, созданная create_all() исходных моделей, доводится до head
+"""
+import pytest
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from app.db.session import _migrate
+
+
+def _config(conn=None):
+    config = Config()
+    config.set_main_option("script_location", "app.db:migrations")
+    config.attributes["connection"] = conn
+    return config
+
+
+def _version(conn):
+    return conn.execute(text("SELECT version_num FROM alembic_version")).scalar_one()
+
+
+HEAD = ScriptDirectory.from_config(_config()).get_current_head()
+
+
+def _legacy_engine(tmp_path):
+    """SQLite со схемой исходных моделей (ревизия 0001) без alembic_version"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        command.upgrade(_config(conn), "0001")
+        conn.execute(text("DROP TABLE alembic_version"))
+        conn.execute(text("INSERT INTO users (id, email, hashed_password) VALUES (1, 'demo@example.com', 'x')"))
+        conn.execute(text(
+            "INSERT INTO scenarios (id, user_id, name, decision_type, created_at) "
+            "VALUES (1, 1, 'old', 'RELOCATION', '2025-01-01 10:00:00.000000')"
+        ))
+        conn.execute(text("INSERT INTO simulations (scenario_id, input_data, status) VALUES (1, '{}', 'COMPLETED')"))
+    return engine
+
+
+def test_legacy_database_gets_timestamp_defaults(tmp_path):
+    """Старые строки получают created_at, новые вставки без него не падают"""
+    engine = _legacy_engine(tmp_path)
+    with engine.begin() as conn:
+        _migrate(conn)
+
+    with engine.begin() as conn:
+        assert conn.execute(text("SELECT created_at FROM users")).scalar_one() is not None
+        conn.execute(text("INSERT INTO scenarios (user_id, name, decision_type) VALUES (1, 'new', 'job')"))
+        rows = conn.execute(text("SELECT created_at, updated_at FROM scenarios ORDER BY id")).all()
+        assert rows[0][0].startswith("2025-01-01")
+        assert rows[1][0] is not None and rows[1][1] is not None
+        assert _version(conn) == HEAD
+
+
+def test_fresh_database_is_stamped_at_head(tmp_path):
+    """Пустая база создаётся из моделей и сразу помечается последней ревизией"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    with engine.begin() as conn:
+        _migrate(conn)
+
+    with engine.begin() as conn:
+        assert {"users", "scenarios", "simulations", "cached_data"} <= set(inspect(conn).get_table_names())
+        assert _version(conn) == HEAD
+
+
+def test_legacy_enum_names_become_values(tmp_path):
+    """Имена членов SQLEnum переписываются в значения, CHECK отклоняет чужие"""
+    engine = _legacy_engine(tmp_path)
+    with engine.begin() as conn:
+        _migrate(conn)
+
+    with engine.begin() as conn:
+        assert conn.execute(text("SELECT decision_type FROM scenarios")).scalar_one() == "relocation"
+        assert conn.execute(text("SELECT status FROM simulations")).scalar_one() == "completed"
+    with pytest.raises(IntegrityError), engine.begin() as conn:
+        conn.execute(text("UPDATE simulations SET status = 'COMPLETED'"))
+
+
+def test_legacy_database_gets_list_indexes(tmp_path):
+    """Составные индексы списков появляются и в старой базе"""
+    engine = _legacy_engine(tmp_path)
+    with engine.begin() as conn:
+        _migrate(conn)
+        inspector = inspect(conn)
+        assert "ix_scenarios_user_created" in {i["name"] for i in inspector.get_indexes("scenarios")}
+        assert "ix_simulations_scenario_created" in {i["name"] for i in inspector.get_indexes("simulations")}
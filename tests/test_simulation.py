@@ -28,5 +28,54 @@ async def test_simulation_imports():
         logger.error(f"Ошибка импорта: {e}")
         pytest.fail(f"Ошибка импорта: {e}")
 
+def test_monte_carlo_savings_distribution():
+    """Векторизованный Monte Carlo сбережений: порядок перцентилей и разумное среднее"""
+    from app.services.simulation_engine import SimulationEngine
+
+    engine = SimulationEngine(time_horizon_years=5, monte_carlo_runs=2000)
+    result = engine._run_monte_carlo_savings(80000, 24000, 0.30)
+
+    assert result["p5"] <= result["p25"] <= result["p50"] <= result["p75"] <= result["p95"]
+    # Без шума: 5 лет * (56000 - 24000) с небольшим ростом
+    assert 150000 < result["mean"] < 180000
+
+def test_monte_carlo_seed_is_reproducible():
+    """Одинаковый seed даёт одинаковые результаты Monte Carlo"""
+    from app.services.simulation_engine import SimulationEngine
+
+    first = SimulationEngine(monte_carlo_runs=500, seed=42)._run_monte_carlo_investment(10000, 0.07, 0.15)
+    second = SimulationEngine(monte_carlo_runs=500, seed=42)._run_monte_carlo_investment(10000, 0.07, 0.15)
+    assert first == second
+
+def test_relocation_cumulative_savings_is_running_sum():
+    """cumulative_savings — сумма сбережений за все прошедшие годы"""
+    from app.services.simulation_engine import SimulationEngine
+    from app.schemas.schemas import DecisionType
+
+    engine = SimulationEngine(time_horizon_years=4, monte_carlo_runs=10, seed=1)
+    result = engine.run_simulation(DecisionType.RELOCATION, {"cities": ["Berlin"]}, {})
+    yearly = result["projections"]["Berlin"]
+
+    running = 0.0
+    for year in yearly:
+        running += year["savings"]
+        assert year["cumulative_savings"] == pytest.approx(running, abs=0.05)
+
+def test_simulation_runs_in_daemonic_worker():
+    """Движок с несколькими опциями работает в демоническом prefork-процессе Celery"""
+    billiard = pytest.importorskip("billiard")
+    from app.services.simulation_engine import run_simulation_in_process
+    from app.schemas.schemas import DecisionType
+
+    pool = billiard.Pool(1)
+    try:
+        result = pool.apply(
+            run_simulation_in_process,
+            (DecisionType.INVESTMENT, {"options": ["stocks", "bonds"]}, {}, 5, 200)
+        )
+    finally:
+        pool.terminate()
+    assert set(result["monte_carlo"]) == {"stocks", "bonds"}
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
\ No newline at end of file